@@ -0,0 +1,228 @@
+"""
+📈 Backtest Runner (Offline)
+รันโมเดลย้อนหลังหลายวัน / ทั้งฤดูกาล จากข้อมูลในเครื่อง (ไม่ยิง api-sports)
+แล้วเขียนผลเป็นไฟล์ Columnar (Parquet ถ้ามี pyarrow ไม่งั้น CSV)
+Walk-forward: Rating / League Baselines ของแต่ละ Chunk สร้างจากผลที่จบก่อนวันแรกของ Chunk เท่านั้น
+(ไม่ใช้ State ปัจจุบันของ Server ที่รวมผลของแมตช์ที่กำลังตรวจไปแล้ว)
+
+ตัวอย่าง:
+    python -m app.backtest_runner --start 2024-08-01 --end 2025-05-31 \\
+        --league "Premier League" --param hdp_cover_high=70 --param ou_over_high=62 --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from app.services.ai_engine import AIEngine
+from app.services.archive import DEFAULT_ARCHIVE_PATH, FixtureArchive
+from app.services.backtest import DEFAULT_ODDS, grade_pick
+from app.services.ratings import RatingEngine
+
+try:
+    import pyarrow  # noqa: F401  (Optional: ใช้เขียน Parquet)
+except ImportError:
+    pyarrow = None
+
+
+# (params, rating_model) ของแต่ละ Worker Process (ตั้งครั้งเดียวใน _init_worker)
+_worker_config = ({}, None)
+
+
+def _parse_params(pairs):
+    """ ["hdp_cover_high=70", ...] -> {"hdp_cover_high": 70.0} (ValueError ถ้าชื่อ / ค่าไม่ถูกต้อง) """
+    params = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        if name not in AIEngine.TUNABLE_PARAMS:
+            raise ValueError(f"unknown param '{name}' (choose from: {', '.join(AIEngine.TUNABLE_PARAMS)})")
+        try:
+            params[name] = float(value)
+        except ValueError:
+            raise ValueError(f"param '{name}' needs a number, got '{value}'")
+    return params
+
+def build_engine(params, ratings_state=None, rating_model=None):
+    """ AIEngine แบบเดียวกับ Production: Threshold ตาม params + Rating / Baselines รายลีก """
+    engine = AIEngine(**params)
+    if ratings_state is not None:
+        ratings = RatingEngine(active=rating_model)
+        ratings.load_state(ratings_state)
+        engine.ratings = ratings
+    return engine
+
+def _init_worker(params, rating_model):
+    global _worker_config
+    _worker_config = (params, rating_model)
+
+def load_fixtures(start, end, leagues=None, archive_path=DEFAULT_ARCHIVE_PATH):
+    """ แมตช์ที่จบแล้วจาก FixtureArchive ในเครื่อง (leagues: league id หรือชื่อลีก) """
+    leagues = leagues or []
+    league_ids = [int(x) for x in leagues if str(x).isdigit()]
+    league_names = {x for x in leagues if not str(x).isdigit()}
+
+    archive = FixtureArchive(archive_path)
+    try:
+        # กรอง id ใน SQL ได้เลย ถ้าระบุเป็นชื่อล้วนค่อยกรองหลัง Decode
+        fixtures = archive.history(start, end, league_ids=None if league_names else league_ids)
+    finally:
+        archive.close()
+    if league_names:
+        fixtures = [
+            (d, m) for d, m in fixtures
+            if m.get("league") in league_names or m.get("league_id") in league_ids
+        ]
+    return fixtures
+
+def replay_chunk(fixtures, ratings_state=None, engine=None, odds=DEFAULT_ODDS):
+    """
+    (รันใน Worker Process) วิเคราะห์ทั้ง Chunk ด้วย predict_many แล้วตรวจผล
+    ratings_state: State ของ RatingEngine ณ วันแรกของ Chunk
+    """
+    if engine is None:
+        params, rating_model = _worker_config
+        engine = build_engine(params, ratings_state, rating_model)
+    predictions = engine.predict_many([m for _, m in fixtures])
+
+    records = []
+    for (match_date, match), prediction in zip(fixtures, predictions):
+        pick = prediction["ai_insight"]["pick"]
+        outcome, profit = grade_pick(pick, match.get("score_home"), match.get("score_away"), odds)
+        records.append({
+            "fixture_id": match["id"],
+            "match_date": match_date,
+            "league_id": match.get("league_id"),
+            "league": match.get("league"),
+            "home_team": match.get("home_team"),
+            "away_team": match.get("away_team"),
+            "score_home": match.get("score_home"),
+            "score_away": match.get("score_away"),
+            "home_win": prediction["probabilities"]["home_win"],
+            "draw": prediction["probabilities"]["draw"],
+            "away_win": prediction["probabilities"]["away_win"],
+            "ht_goal_prob": prediction["first_half_analysis"]["probability"],
+            "over_2_5": prediction["goals_market"]["over_2_5"],
+            "expected_goal_diff": prediction["handicap_market"]["expected_goal_diff"],
+            "top_score": prediction["score_distribution"]["top_scores"][0]["score"],
+            "top_score_prob": prediction["score_distribution"]["top_scores"][0]["probability"],
+            "main_pick": prediction["ai_insight"]["main_pick"],
+            "market": pick["market"] if pick else None,
+            "side": pick["side"] if pick else None,
+            "line": pick["line"] if pick else None,
+            "odds": odds,
+            "outcome": outcome,
+            "profit": profit,
+        })
+    return records
+
+def _chunks(fixtures, size):
+    for i in range(0, len(fixtures), size):
+        yield fixtures[i:i + size]
+
+def load_results(archive_path=DEFAULT_ARCHIVE_PATH):
+    """ ผลการแข่งขันทั้งหมดใน Archive (item ดิบ เรียงตามวัน) ใช้เดิน Rating ไปข้างหน้า """
+    archive = FixtureArchive(archive_path)
+    try:
+        return archive.finished_fixtures()
+    finally:
+        archive.close()
+
+def run(start, end, leagues=None, params=None, workers=None, chunk_size=500, archive_path=DEFAULT_ARCHIVE_PATH,
+        rating_model=None):
+    fixtures = load_fixtures(start, end, leagues, archive_path)
+    if not fixtures:
+        return []
+    params = params or {}
+    workers = workers or os.cpu_count() or 1
+    results = load_results(archive_path)
+
+    # Walk-forward: ก่อนส่งแต่ละ Chunk ให้ observe เฉพาะผลที่จบก่อนวันแรกของ Chunk แล้วส่ง Snapshot ไปด้วย
+    # (Chunk เล็กลง = Rating ใกล้วันแข่งมากขึ้น แลกกับ State ที่ต้อง Pickle บ่อยขึ้น)
+    ratings = RatingEngine(active=rating_model)
+    observed = 0
+    records = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(params, rating_model)) as pool:
+        futures = []
+        for chunk in _chunks(fixtures, chunk_size):
+            first_day = chunk[0][0]
+            upto = observed
+            while upto < len(results) and results[upto]["fixture"]["date"][:10] < first_day:
+                upto += 1
+            ratings.observe_fixtures(results[observed:upto])
+            observed = upto
+            ratings.prune()
+            futures.append(pool.submit(replay_chunk, chunk, ratings.state()))
+        for future in futures:
+            records.extend(future.result())
+    return records
+
+def write_results(records, out_path):
+    """ เขียนแบบ Columnar: .parquet (ต้องมี pyarrow) ไม่งั้นเปลี่ยนเป็น .csv """
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(records)
+    root, ext = os.path.splitext(out_path)
+    if ext == ".parquet" and pyarrow is None:
+        print("⚠️ pyarrow not installed: writing CSV instead of Parquet")
+        out_path = root + ".csv"
+    if out_path.endswith(".parquet"):
+        frame.to_parquet(out_path, index=False)
+    else:
+        frame.to_csv(out_path, index=False)
+    return frame, out_path
+
+def summarize(frame):
+    """ Hit Rate / ROI แยกตามตลาด (เฉพาะแมตช์ที่มี Pick) """
+    bets = frame[frame["market"].notna()]
+    if bets.empty:
+        return bets
+    grouped = bets.groupby("market")
+    summary = grouped.agg(
+        bets=("fixture_id", "count"),
+        win=("outcome", lambda o: o.isin(["Win", "Half Win"]).sum()),
+        loss=("outcome", lambda o: o.isin(["Loss", "Half Loss"]).sum()),
+        profit=("profit", "sum"),
+    )
+    summary["hit_rate"] = (summary["win"] / (summary["win"] + summary["loss"]) * 100).round(1)
+    summary["roi"] = (summary["profit"] / summary["bets"] * 100).round(1)
+    return summary
+
+def main(argv=None):
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    parser = argparse.ArgumentParser(description="Replay AIEngine over archived finished fixtures")
+    parser.add_argument("--start", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--end", default=yesterday, help="YYYY-MM-DD (default: yesterday)")
+    parser.add_argument("--league", action="append", dest="leagues", help="League id or name (repeatable)")
+    parser.add_argument("--param", action="append", dest="params",
+                        help=f"Override engine threshold, e.g. hdp_cover_high=70 ({', '.join(AIEngine.TUNABLE_PARAMS)})")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500,
+                        help="Fixtures per worker task (ratings are frozen at each chunk's first day)")
+    parser.add_argument("--out", default=None, help="Output file (.parquet or .csv)")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH, help="FixtureArchive sqlite file")
+    parser.add_argument("--rating-model", default=None,
+                        help="Rating model to replay with (default: RATING_MODEL env, same as the server)")
+    args = parser.parse_args(argv)
+
+    try:
+        params = _parse_params(args.params)
+    except ValueError as e:
+        parser.error(str(e))
+    started = time.time()
+    records = run(args.start, args.end, args.leagues, params, args.workers, args.chunk_size, args.archive,
+                  args.rating_model)
+    if not records:
+        print(f"⚠️ No archived fixtures between {args.start} and {args.end}")
+        return 1
+
+    out_path = args.out or f"backtest_{args.start}_{args.end}.parquet"
+    frame, out_path = write_results(records, out_path)
+    print(f"✅ Replayed {len(frame)} fixtures in {time.time() - started:.1f}s -> {out_path}")
+    print(summarize(frame).to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,39 @@
+from fastapi import Request
+
+from app.services.container import ServiceContainer
+from app.services.football_data import FootballDataService
+from app.services.ai_engine import AIEngine
+from app.services.prediction_cache import PredictionCache
+from app.services.live_feed import LiveHub
+from app.services.backtest import BacktestService
+from app.services.auth_cache import AuthCache
+from app.services.password_hasher import PasswordHasher
+from app.services.rate_limit import RateLimiter
+
+
+def get_services(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+def get_football_service(request: Request) -> FootballDataService:
+    return request.app.state.services.football_service
+
+def get_ai_engine(request: Request) -> AIEngine:
+    return request.app.state.services.ai_engine
+
+def get_prediction_cache(request: Request) -> PredictionCache:
+    return request.app.state.services.prediction_cache
+
+def get_live_hub(request: Request) -> LiveHub:
+    return request.app.state.services.live_hub
+
+def get_backtest_service(request: Request) -> BacktestService:
+    return request.app.state.services.backtest
+
+def get_auth_cache(request: Request) -> AuthCache:
+    return request.app.state.services.auth_cache
+
+def get_password_hasher(request: Request) -> PasswordHasher:
+    return request.app.state.services.password_hasher
+
+def get_rate_limiter(request: Request) -> RateLimiter:
+    return request.app.state.services.rate_limiter
@@ -1,13 +1,27 @@
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import payment, analysis, matches, auth, history # <--- 1. เพิ่ม auth ตรงนี้
-from app.database import engine, Base
+from app.database import dispose_engines
+from app.migrate import ensure_schema
+from app.services.container import ServiceContainer
 
-# Create DB Tables
-Base.metadata.create_all(bind=engine)
+# Schema สร้าง / อัปเดตด้วย `python -m app.migrate` (ก่อน Start ไม่ใช่ตอน Import ของทุก Worker)
 
-app = FastAPI(title="GoalSnap")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema ยังไม่ได้ Migrate -> หยุดตั้งแต่ Start (แทนที่จะ Error ตอนมี Request)
+    ensure_schema()
+    # Service ชุดเดียวใช้ร่วมกันทุก Router (Stats โหลดใน Background)
+    services = ServiceContainer()
+    services.startup()
+    app.state.services = services
+    yield
+    await services.shutdown()
+    await dispose_engines()
+
+app = FastAPI(title="GoalSnap", lifespan=lifespan)
 
 # --- CORS Configuration ---
 origins = [
@@ -34,4 +48,9 @@ app.include_router(history.router, prefix="/api/v1/history", tags=["history"])
 
 @app.get("/")
 def health_check():
-    return {"status": "running", "service": "football-api"}
\ No newline at end of file
+    return {"status": "running", "service": "football-api"}
+
+@app.get("/metrics")
+def metrics(request: Request):
+    """ สถานะภายในของ Worker นี้ (Cache / คิว Hash รหัสผ่าน) """
+    return request.app.state.services.metrics()
@@ -0,0 +1,69 @@
+"""
+🗄️ Schema Migration (รันครั้งเดียวก่อน Start Worker ไม่ใช่ทุกครั้งที่ Worker Boot)
+    python -m app.migrate
+สร้างตารางที่ยังไม่มีตาม app.models (ตารางที่มีอยู่แล้วไม่ถูกแก้)
+    python -m app.migrate --check   # แค่ตรวจ (exit 1 ถ้ายังมี Schema ค้าง)
+Server เรียก ensure_schema() ตอน Start: Schema ยังไม่ครบ -> ไม่ Start (ไม่ไป Error กลาง Request)
+คอลัมน์ใหม่ในตารางเดิม create_all เพิ่มให้ไม่ได้ -> รายงานไว้ให้ ALTER TABLE เอง
+"""
+import argparse
+
+from sqlalchemy import inspect
+
+from app import models  # noqa: F401  (ลงทะเบียน Model ทั้งหมดกับ Base.metadata)
+from app.database import Base, engine
+
+
+def pending_tables():
+    existing = set(inspect(engine).get_table_names())
+    return [table.name for table in Base.metadata.sorted_tables if table.name not in existing]
+
+def pending_columns():
+    """ "table.column" ที่มีใน Model แต่ไม่มีในตารางที่สร้างไว้แล้ว """
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing: continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in columns)
+    return missing
+
+def ensure_schema():
+    """ ตอน Start Server: RuntimeError ถ้า Schema ยังไม่ตรงกับ app.models """
+    tables, columns = pending_tables(), pending_columns()
+    if tables or columns:
+        url = engine.url.render_as_string(hide_password=True)
+        raise RuntimeError(
+            f"Database schema is behind app.models ({url}): "
+            f"missing tables [{', '.join(tables)}] columns [{', '.join(columns)}]. "
+            "Run `python -m app.migrate` before starting the server."
+        )
+
+def migrate():
+    missing = pending_tables()
+    Base.metadata.create_all(bind=engine)
+    return missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create missing database tables")
+    parser.add_argument("--check", action="store_true", help="Only list missing tables (exit 1 if any)")
+    args = parser.parse_args(argv)
+
+    url = engine.url.render_as_string(hide_password=True)
+    if args.check:
+        missing = pending_tables() + pending_columns()
+        print(f"{url}: {', '.join(missing) if missing else 'up to date'}")
+        return 1 if missing else 0
+
+    created = migrate()
+    print(f"✅ {url}: created {', '.join(created)}" if created else f"✅ {url}: up to date")
+    columns = pending_columns()
+    if columns:
+        print(f"⚠️ {url}: columns need a manual ALTER TABLE: {', '.join(columns)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
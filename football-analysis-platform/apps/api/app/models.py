@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text
 from sqlalchemy.sql import func
 from app.database import Base
 from pydantic import BaseModel
@@ -18,6 +18,37 @@ class User(Base):
     is_premium = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class BacktestResult(Base):
+    """ ผลวิเคราะห์ของแมตช์ที่จบแล้ว + ผลตรวจ (คำนวณครั้งเดียวแล้วเก็บไว้) """
+    __tablename__ = "backtest_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    fixture_id = Column(Integer, unique=True, index=True)
+    match_date = Column(String, index=True)         # YYYY-MM-DD (วันที่ที่ใช้ดึงจาก api-sports)
+    league_id = Column(Integer, index=True, nullable=True)
+    league = Column(String, index=True)
+    home_team = Column(String)
+    away_team = Column(String)
+    score_home = Column(Integer)
+    score_away = Column(Integer)
+    main_pick = Column(String)
+    market = Column(String, index=True, nullable=True)  # handicap / over_under (None = No Advice)
+    side = Column(String, nullable=True)                # home / away / over / under
+    line = Column(Float, nullable=True)
+    odds = Column(Float, default=1.90)
+    outcome = Column(String)                            # Win / Half Win / Push / Half Loss / Loss / N/A
+    profit = Column(Float, default=0.0)                 # หน่วย: เดิมพัน 1 unit
+    match_json = Column(Text)                           # ข้อมูลแมตช์ที่ส่งกลับหน้า History
+    graded_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class BacktestDay(Base):
+    """ วันที่ตรวจผลครบทุกแมตช์แล้ว (วันปิดไปแล้ว + เก็บแมตช์ FT ครบทั้งวัน) -> ไม่ต้องดึงซ้ำ """
+    __tablename__ = "backtest_days"
+
+    match_date = Column(String, primary_key=True)   # YYYY-MM-DD
+    fixtures = Column(Integer, default=0)
+    completed_at = Column(DateTime(timezone=True), server_default=func.now())
+
 # ==========================================
 # 🚀 Pydantic Models (Schemas)
 # ==========================================
@@ -64,6 +95,7 @@ class FirstHalfAnalysis(BaseModel):
 
 class GoalsMarket(BaseModel):
     over_2_5: float
+    btts: Optional[float] = None
     real_line: float
     probability: float
     analysis: str
@@ -74,6 +106,7 @@ class HandicapMarket(BaseModel):
 
 class AIInsight(BaseModel):
     main_pick: str
+    pick: Optional[Dict] = None
     confidence: str
     momentum_analysis: Optional[str] = ""
     lineup_analysis: Optional[str] = ""
@@ -90,6 +123,7 @@ class PredictionResponse(BaseModel):
     first_half_analysis: Optional[FirstHalfAnalysis] = None
     
     expected_score: str
+    score_distribution: Optional[Dict] = None
     goals_market: GoalsMarket
     handicap_market: HandicapMarket
     ai_insight: AIInsight
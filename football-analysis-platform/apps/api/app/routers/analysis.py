@@ -1,27 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
 from app.services.football_data import FootballDataService
-from app.services.ai_engine import AIEngine
-from app.routers.auth import get_current_user
-from app.models import User, AnalysisResponse
+from app.services.prediction_cache import PredictionCache
+from app.dependencies import get_football_service, get_prediction_cache
+from app.routers.auth import AnalysisQuota, analysis_quota
+from app.models import AnalysisResponse
 
 router = APIRouter()
-football_service = FootballDataService()
-ai_engine = AIEngine()
 
 @router.get("/{match_id}/analyze", response_model=AnalysisResponse)
-def analyze_match(
+async def analyze_match(
     match_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    quota: AnalysisQuota = Depends(analysis_quota),
+    football_service: FootballDataService = Depends(get_football_service),
+    prediction_cache: PredictionCache = Depends(get_prediction_cache)
 ):
-    match_data = football_service.get_match_by_id(match_id)
+    # Stats-only: ยิง Upstream เฉพาะแมตช์ที่ไม่อยู่ใน Slate / Archive -> ตัด Quota เฉพาะกรณีนั้น
+    if not football_service.has_match_locally(match_id):
+        await quota.charge()
+    match_data = await football_service.get_match_by_id(match_id)
     if not match_data:
         raise HTTPException(status_code=404, detail="Match not found")
 
     # เรียก AI คำนวณ (ซึ่ง ai_engine ตัวใหม่มี first_half_analysis แล้ว)
-    ai_res = ai_engine.predict_match(match_data)
+    ai_res = prediction_cache.get_or_predict(match_data)
     
     return {
         "match": match_data,
@@ -34,6 +35,7 @@ def analyze_match(
             "goals_market": ai_res["goals_market"],
             "handicap_market": ai_res["handicap_market"],
             "ai_insight": ai_res["ai_insight"],
+            "score_distribution": ai_res.get("score_distribution"),
             "form_analysis": ai_res.get("form_analysis")
         }
     }
\ No newline at end of file
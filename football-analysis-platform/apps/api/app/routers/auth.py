@@ -1,16 +1,19 @@
 import os
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
-from passlib.context import CryptContext
+from pydantic import BaseModel, EmailStr, field_validator
 from jose import JWTError, jwt
 from app.database import get_db
 from app.models import User
+from app.services.auth_cache import AuthCache, CurrentUser
+from app.services.password_hasher import MAX_PASSWORD_BYTES, PasswordHasher, HasherBusy
+from app.services.rate_limit import RateLimiter
+from app.dependencies import get_auth_cache, get_password_hasher, get_rate_limiter
 from dotenv import load_dotenv
-import bcrypt
 
 load_dotenv()
 
@@ -21,7 +24,6 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 7 Days
 
 # --- Security Setup ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login") # แก้ path ให้ตรงกับ router จริง
 
 router = APIRouter()
@@ -32,6 +34,14 @@ class UserCreate(BaseModel):
     email: EmailStr
     password: str
 
+    @field_validator("password")
+    @classmethod
+    def password_fits_bcrypt(cls, value):
+        # ยาวเกินที่ bcrypt รับได้ -> 422 (ไม่ใช่ 500 ตอน Hash)
+        if len(value.encode("utf-8")) > MAX_PASSWORD_BYTES:
+            raise ValueError(f"password must be at most {MAX_PASSWORD_BYTES} bytes")
+        return value
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -53,16 +63,21 @@ class UserOut(BaseModel):
         from_attributes = True
 
 # --- Helper Functions ---
-def verify_password(plain_password, hashed_password):
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'), 
-        hashed_password.encode('utf-8')
-    )
+# bcrypt ทำใน PasswordHasher (Thread Pool แยก) / DB ทำผ่าน run_in_threadpool -> Endpoint เป็น async ได้
+async def _run_hasher(job):
+    try:
+        return await job
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "2"})
 
-def get_password_hash(password):
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+def _find_user(db: Session, *conditions):
+    return db.query(User).filter(*conditions).first()
+
+def _save_user(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -74,14 +89,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_access_token(token: str) -> dict:
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    auth_cache: AuthCache = Depends(get_auth_cache),
+) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # Token ที่เคย Decode แล้วไม่ต้องตรวจ Signature ซ้ำ (cache ไม่เกินเวลา exp)
+        payload = auth_cache.decode(token, decode_access_token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
@@ -89,22 +111,88 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     
     # แปลง user_id เป็น int ก่อน query (เพราะใน DB เป็น Integer)
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    # User มาจาก Cache / ถ้าไม่มีค่อย Query ใน Threadpool (ไม่บล็อก Event Loop)
+    try:
+        user = await auth_cache.get_user(int(user_id))
+    except ValueError:
+        raise credentials_exception
     if user is None:
         raise credentials_exception
     return user
 
+class AnalysisQuota:
+    """
+    Quota การวิเคราะห์ของ Request นี้ (Bucket ต่อ User ตาม Tier และต่อ IP)
+    Endpoint เรียก charge() เฉพาะตอนที่งานต้องยิง Upstream จริง (ผลที่ตอบจาก Cache ในเครื่องไม่เสีย Quota)
+    charge() ซ้ำใน Request เดียวกันตัดแค่ครั้งเดียว
+    """
+    def __init__(self, request: Request, response: Response, user: CurrentUser, limiter: RateLimiter):
+        self.user = user
+        self.response = response
+        self.limiter = limiter
+        self.ip = request.client.host if request.client else "unknown"
+        self.charged = False
+
+    def _hit_all(self):
+        # ตัด Bucket ของ IP เฉพาะเมื่อ User ผ่าน (User ที่โดนจำกัดไม่ทำให้คนอื่นใน IP เดียวกันเสีย Quota)
+        tier = "premium" if self.user.is_premium else "free"
+        user_limit = self.limiter.hit("user", self.user.id, tier)
+        if not user_limit.allowed:
+            return [user_limit]
+        return [user_limit, self.limiter.hit("ip", self.ip, "default")]
+
+    async def charge(self):
+        """ ตัด 1 token / HTTPException 429 ถ้า Bucket หมด """
+        if self.charged: return
+        self.charged = True
+        results = await run_in_threadpool(self._hit_all) if self.limiter.blocking else self._hit_all()
+        user_limit = results[0]
+        denied = [r for r in results if not r.allowed]
+        if denied:
+            retry_after = max(1, int(max(r.retry_after for r in denied) + 0.999))
+            raise HTTPException(
+                status_code=429,
+                detail="Analysis rate limit exceeded",
+                headers={
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(user_limit.limit),
+                    "X-RateLimit-Remaining": str(min(r.remaining for r in results)),
+                },
+            )
+        self.response.headers["X-RateLimit-Limit"] = str(user_limit.limit)
+        self.response.headers["X-RateLimit-Remaining"] = str(min(r.remaining for r in results))
+
+async def analysis_quota(
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    limiter: RateLimiter = Depends(get_rate_limiter),
+) -> AnalysisQuota:
+    """ get_current_user + Quota ที่ Endpoint ตัดเองเมื่อต้องยิง Upstream """
+    return AnalysisQuota(request, response, current_user, limiter)
+
+async def limit_analysis(quota: AnalysisQuota = Depends(analysis_quota)) -> CurrentUser:
+    """ get_current_user + ตัด Quota 1 ครั้งทันที (Endpoint แบบ Batch ที่คิดเป็น 1 Request) """
+    await quota.charge()
+    return quota.user
+
 # --- Endpoints ---
 
 @router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(
+    user: UserCreate,
+    db: Session = Depends(get_db),
+    hasher: PasswordHasher = Depends(get_password_hasher),
+):
     # 1. Check if user exists
-    db_user = db.query(User).filter((User.email == user.email) | (User.username == user.username)).first()
+    db_user = await run_in_threadpool(
+        _find_user, db, (User.email == user.email) | (User.username == user.username)
+    )
     if db_user:
         raise HTTPException(status_code=400, detail="Email or Username already registered")
     
     # 2. Hash password & Create User
-    hashed_password_val = get_password_hash(user.password)
+    hashed_password_val = await _run_hasher(hasher.hash(user.password))
     new_user = User(
         email=user.email,
         username=user.username,
@@ -112,22 +200,36 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password_val, 
         is_premium=False
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    return await run_in_threadpool(_save_user, db, new_user)
 
 @router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(
+    user_credentials: UserLogin,
+    db: Session = Depends(get_db),
+    auth_cache: AuthCache = Depends(get_auth_cache),
+    hasher: PasswordHasher = Depends(get_password_hasher),
+):
     # 1. Fetch User (Login ด้วย Email)
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+    user = await run_in_threadpool(_find_user, db, User.email == user_credentials.email)
     if not user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
     
     # 2. Verify Password (ใช้ hashed_password ให้ตรงกับ DB)
-    if not verify_password(user_credentials.password, user.hashed_password):
+    if not await _run_hasher(hasher.verify(user_credentials.password, user.hashed_password)):
         raise HTTPException(status_code=400, detail="Invalid credentials")
+
+    # BCRYPT_ROUNDS เปลี่ยน -> Hash ใหม่ด้วยรหัสที่เพิ่งตรวจผ่าน (ถ้าคิวเต็มก็ข้ามไปก่อน รอบหน้าค่อยทำ)
+    if hasher.needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await hasher.hash(user_credentials.password)
+            user = await run_in_threadpool(_save_user, db, user)
+            hasher.rehashed += 1
+        except HasherBusy:
+            pass
     
+    # User กำลังจะใช้ Token เรียก API ต่อ -> ใส่ Cache ไว้เลย
+    auth_cache.put_user(user)
+
     # 3. Generate JWT
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
@@ -145,6 +247,6 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.get("/me", response_model=UserOut)
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: CurrentUser = Depends(get_current_user)):
     """Protected route: Returns the current user's profile."""
     return current_user
\ No newline at end of file
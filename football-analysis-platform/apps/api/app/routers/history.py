@@ -1,73 +1,76 @@
-from fastapi import APIRouter
-from app.services.football_data import FootballDataService
-from app.services.ai_engine import AIEngine
+import json
+from datetime import date as date_type
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.services.backtest import BacktestService
+from app.dependencies import get_backtest_service
 
 router = APIRouter()
-football_service = FootballDataService()
-ai_engine = AIEngine()
+
+# ช่วงวันที่สูงสุดต่อการ Query สรุปผล
+MAX_RANGE_DAYS = 400
+
+def _to_item(row):
+    return {
+        "match": json.loads(row.match_json),
+        "prediction": row.main_pick,
+        "pick": {"market": row.market, "side": row.side, "line": row.line} if row.market else None,
+        "outcome": row.outcome,
+        "profit": row.profit,
+    }
+
+def _check_range(start: str, end: str):
+    try:
+        days = (date_type.fromisoformat(end) - date_type.fromisoformat(start)).days
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if days < 0 or days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must be 0-{MAX_RANGE_DAYS} days")
 
 @router.get("/")
-def get_history(date: str):
-    # 1. ดึงแมตช์ที่จบแล้ว
-    matches = football_service.get_history_matches(date)
-    
-    summary = {"win": 0, "loss": 0, "draw": 0, "total": 0}
-    results = []
-    
-    for match in matches:
-        # 2. ให้ AI วิเคราะห์แมตช์นี้ (Simulate Prediction)
-        analysis = ai_engine.predict_match(match)
-        main_pick = analysis["ai_insight"]["main_pick"]
-        
-        # 3. ตรวจคำตอบ (Check Result)
-        outcome = "N/A"
-        
-        # ตรวจ Logic Over/Under
-        if "GOAL" in main_pick:
-            outcome = ai_engine.check_outcome(main_pick, match["score_home"], match["score_away"])
-        
-        # ตรวจ Logic Handicap (แบบ Manual Check เพื่อความชัวร์)
-        elif "HANDICAP" in main_pick:
-            # ดึง Line และ ทีมที่เชียร์ จาก analysis structure
-            sugg = analysis["handicap_market"]["suggested_line"] # Ex: "Bet: Arsenal -0.5 (70%)"
-            if "Bet:" in sugg:
-                try:
-                    parts = sugg.replace("Bet: ", "").split(" ")
-                    team_name = parts[0]
-                    line = float(parts[1])
-                    
-                    diff = match["score_home"] - match["score_away"]
-                    
-                    # ถ้าเชียร์ทีมเหย้า
-                    if team_name == match["home_team"]:
-                        if diff + line > 0: outcome = "Win"
-                        elif diff + line == 0: outcome = "Push"
-                        else: outcome = "Loss"
-                    # ถ้าเชียร์ทีมเยือน
-                    else:
-                        # มุมมองทีมเยือน: ผลต่างต้องเป็นลบ (Away ชนะ) หรือบวกน้อยๆ
-                        # วิธีคิด Asian Handicap: Score Away - Score Home + Line > 0
-                        # หรือคิดง่ายๆ: ปรับ Line ให้เป็นมุมมอง Home แล้วเทียบ Diff
-                        # แต่เพื่อความง่าย ใช้ Logic: (ScoreHome + Line) vs ScoreAway
-                        if (match["score_away"] + line) > match["score_home"]: outcome = "Win" # Logic แบบง่าย
-                        else: outcome = "Loss"
-                except: pass
+async def get_history(
+    date: str,
+    db: Session = Depends(get_db),
+    backtest: BacktestService = Depends(get_backtest_service)
+):
+    # 1-3. แมตช์ที่จบแล้วของวันนั้น: วิเคราะห์ + ตรวจผลครั้งเดียวแล้วเก็บลง DB (ครั้งต่อไปอ่านจาก DB)
+    # (DB / AI ทำใน Thread ภายใน grade_date ไม่บล็อก Event Loop)
+    _check_range(date, date)
+    rows = await backtest.grade_date(db, date)
 
-        # นับคะแนน
-        if outcome == "Win": summary["win"] += 1
-        elif outcome == "Loss": summary["loss"] += 1
-        elif outcome == "Push": summary["draw"] += 1
-        
-        if outcome != "N/A": summary["total"] += 1
-        
-        results.append({
-            "match": match,
-            "prediction": main_pick,
-            "outcome": outcome
-        })
-        
     return {
         "date": date,
-        "summary": summary,
-        "matches": results
-    }
\ No newline at end of file
+        "summary": backtest.summarize_day(rows),
+        "matches": [_to_item(r) for r in rows]
+    }
+
+@router.get("/results")
+def get_results(
+    start: str,
+    end: str,
+    league: Optional[str] = None,
+    db: Session = Depends(get_db),
+    backtest: BacktestService = Depends(get_backtest_service)
+):
+    """ ผลที่ตรวจแล้วในช่วงวันที่ (อ่านจาก DB อย่างเดียว ไม่ดึง Upstream) """
+    _check_range(start, end)
+    rows = backtest.get_results(db, start, end, league=league)
+    return {
+        "start": start,
+        "end": end,
+        "summary": backtest.summarize_day(rows),
+        "matches": [_to_item(r) for r in rows]
+    }
+
+@router.get("/summary")
+def get_summary(
+    start: str,
+    end: str,
+    db: Session = Depends(get_db),
+    backtest: BacktestService = Depends(get_backtest_service)
+):
+    """ 📈 Hit Rate / ROI รวม + แยกตามตลาด + แยกตามลีก """
+    _check_range(start, end)
+    return backtest.summarize(db, start, end)
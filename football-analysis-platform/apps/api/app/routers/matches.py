@@ -1,40 +1,197 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+import asyncio
+import gzip
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from app.services.football_data import FootballDataService
-from app.services.ai_engine import AIEngine
-from app.routers.auth import get_current_user
-from app.models import User
+from app.services.prediction_cache import PredictionCache
+from app.services.live_feed import LiveHub
+from app.services import match_store
+from app.dependencies import get_football_service, get_prediction_cache, get_live_hub
+from app.routers.auth import AnalysisQuota, analysis_quota, limit_analysis
+from app.services.auth_cache import CurrentUser
 
 router = APIRouter()
-football_service = FootballDataService()
-ai_engine = AIEngine()
+
+# เวลารวมสูงสุด (วินาที) ที่รอข้อมูลจาก Upstream ต่อ 1 การวิเคราะห์
+ANALYZE_DEADLINE = 6.0
+# จำนวนแมตช์สูงสุดต่อหน้า (?limit=)
+MAX_PAGE_SIZE = 200
+
+def _parse_fields(fields: Optional[str]):
+    """ ?fields=id,status,goals_home -> ("id", "status", "goals_home") (id ติดไปเสมอ) """
+    if not fields: return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    if "id" not in selected: selected.insert(0, "id")
+    return tuple(dict.fromkeys(selected))
+
+def _etag_matches(if_none_match: Optional[str], etag: str):
+    if not if_none_match: return False
+    if if_none_match.strip() == "*": return True
+    # Weak comparison: ตัด W/ ออกก่อนเทียบ
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags
+
+def _pick_encoding(accept_encoding: str):
+    accepted = {e.split(";")[0].strip() for e in (accept_encoding or "").lower().split(",")}
+    if "br" in accepted and match_store.brotli is not None: return "br"
+    if "gzip" in accepted: return "gzip"
+    return "identity"
+
+def _parse_kickoff(value: Optional[str], name: str):
+    """ ISO datetime -> String UTC แบบเดียวกับ kickoff_time ใน Slate (เทียบแบบ String ได้) """
+    if not value: return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected ISO datetime")
+    if parsed.tzinfo is None: parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+def _send(request: Request, view, body_items, selected, etag, headers):
+    """ 304 ถ้า ETag ตรง ไม่งั้นส่ง JSON (บีบอัดตาม Accept-Encoding) """
+    headers.update({"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"})
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding = _pick_encoding(request.headers.get("accept-encoding"))
+    if body_items is None:
+        content = view.render(selected, encoding)
+    else:
+        if selected:
+            body_items = [{f: m.get(f) for f in selected} for m in body_items]
+        content = json.dumps(body_items, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if encoding == "br":
+            content = match_store.brotli.compress(content, quality=5)
+        elif encoding == "gzip":
+            content = gzip.compress(content, compresslevel=6)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
 
 @router.get("/")
-def get_matches():
-    return football_service.get_upcoming_matches()
+async def get_matches(
+    request: Request,
+    fields: Optional[str] = None,
+    league: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(live|upcoming|finished|other)$"),
+    kickoff_from: Optional[str] = None,
+    kickoff_to: Optional[str] = None,
+    has_value: bool = False,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    football_service: FootballDataService = Depends(get_football_service),
+    prediction_cache: PredictionCache = Depends(get_prediction_cache)
+):
+    """
+    Slate ทั้งหมด (Slate + Live)
+    - ETag / If-None-Match: ไม่มีอะไรเปลี่ยน -> 304 ไม่มี Body
+    - ?fields=id,status,goals_home,goals_away: ส่งเฉพาะฟิลด์ที่ต้องใช้ (สำหรับ Client ที่ Poll)
+    - gzip / br ตาม Accept-Encoding (Body ถูก Cache ไว้ต่อ View ไม่ Serialize ซ้ำ)
+    - ตัวกรอง (ใช้ Index ไม่ไล่ทั้ง List): ?league=<id หรือชื่อ>&status=live|upcoming|finished
+      &kickoff_from=&kickoff_to=<ISO>&has_value=true
+    - แบ่งหน้า: ?limit=50 แล้วส่ง X-Next-Cursor / Link กลับไปเป็น ?cursor= ของหน้าถัดไป
+      (Body ยังเป็น List เหมือนเดิม จำนวนทั้งหมดอยู่ใน X-Total-Count)
+    """
+    view = await football_service.get_slate_view()
+    selected = _parse_fields(fields)
+
+    filters = {
+        "league": int(league) if league and league.isdigit() else (league or None),
+        "status": status,
+        "kickoff_from": _parse_kickoff(kickoff_from, "kickoff_from"),
+        "kickoff_to": _parse_kickoff(kickoff_to, "kickoff_to"),
+        "fixture_ids": prediction_cache.value_fixture_ids if has_value else None,
+    }
+    if not any(v is not None for v in filters.values()) and cursor is None and limit is None:
+        # ไม่มีตัวกรอง: ใช้ Body ทั้ง Slate ที่ Cache ไว้แล้ว
+        return _send(request, view, None, selected, view.etag_for(selected), {})
+
+    try:
+        after = match_store.decode_cursor(cursor) if cursor else None
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    items, total, next_cursor = view.filter(**filters, cursor=after, limit=limit)
+
+    headers = {"X-Total-Count": str(total)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    # ETag ต่อ (View, ชุด Query): has_value ผูกกับผล warm ล่าสุดด้วย
+    query = request.url.query + (",".join(map(str, sorted(filters["fixture_ids"]))) if has_value else "")
+    query_key = hashlib.blake2b(query.encode("utf-8"), digest_size=4).hexdigest()
+    etag = view.etag_for(selected)[:-1] + f'-{query_key}"'
+    return _send(request, view, items, selected, etag, headers)
+
+@router.get("/live/stream")
+async def stream_live_scores(request: Request, live_hub: LiveHub = Depends(get_live_hub)):
+    """
+    📡 Server-Sent Events: ส่ง snapshot ของคู่ที่ Live ครั้งแรก แล้วส่งเฉพาะคู่ที่เปลี่ยน (delta)
+    แทนการ Poll ทั้ง Slate ทุก 15 วินาที
+    """
+    return StreamingResponse(
+        live_hub.stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/predictions")
+async def get_predictions(
+    ids: Optional[str] = None,
+    current_user: CurrentUser = Depends(limit_analysis),
+    football_service: FootballDataService = Depends(get_football_service),
+    prediction_cache: PredictionCache = Depends(get_prediction_cache)
+):
+    """
+    ผลวิเคราะห์ของทั้ง Slate (หรือ ?ids=1,2,3) ใน Request เดียว สำหรับหน้า Dashboard
+    ใช้เฉพาะข้อมูลในเครื่อง (Stats + Odds / Injuries / Lineups ที่ Cache ไว้) ไม่ยิง Upstream -> ตัด Quota 1 ครั้งต่อ Request
+    """
+    view = await football_service.get_slate_view()
+    if ids:
+        try:
+            wanted = [int(i) for i in ids.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid ids: expected comma-separated fixture ids")
+        if len(wanted) > MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids per request")
+        matches, _, _ = view.filter(fixture_ids=set(wanted))
+    else:
+        matches = view.matches
+    # predict_many ของทั้ง Slate ใช้ CPU -> ทำใน Thread (ไม่บล็อก Event Loop)
+    predictions = await asyncio.to_thread(prediction_cache.get_many, matches, football_service.cached_match_details)
+    return {"predictions": predictions}
 
 @router.get("/{match_id}/analyze")
-def analyze_match(
+async def analyze_match(
     match_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    quota: AnalysisQuota = Depends(analysis_quota),
+    football_service: FootballDataService = Depends(get_football_service),
+    prediction_cache: PredictionCache = Depends(get_prediction_cache)
 ):
+    # ตัด Quota เฉพาะเมื่อต้องยิง Upstream (แมตช์นอก Slate / Odds, Injuries, Lineups, H2H ที่ยังไม่มีในเครื่อง)
+    if not football_service.has_match_locally(match_id):
+        await quota.charge()
+
     # 1. ดึงข้อมูลแมตช์พื้นฐาน
-    match_data = football_service.get_match_by_id(match_id)
+    match_data = await football_service.get_match_by_id(match_id)
     if not match_data:
         raise HTTPException(status_code=404, detail="Match not found")
+    if not football_service.details_cached(match_data):
+        await quota.charge()
 
-    # 2. ดึงราคา Odds จริงจาก API (Bet365)
-    real_odds = football_service.get_match_odds(match_id)
-
-    # 3. 🔥 ดึงข้อมูลผู้เล่นบาดเจ็บ (Injuries) และ ไลน์อัป (Lineups)
-    injuries = football_service.get_match_injuries(match_id)
-    lineups = football_service.get_match_lineups(match_id)
+    # 2-3. 🔥 ดึง Odds (Bet365) / Injuries / Lineups / H2H พร้อมกัน (มี Deadline ต่อ Request)
+    details, missing = await football_service.get_match_details(match_data, deadline=ANALYZE_DEADLINE)
+    real_odds = details["odds"]
+    injuries = details["injuries"]
+    lineups = details["lineups"]
 
     # 4. 🔥 ส่งข้อมูลทั้งหมดเข้าไปให้ AI ประมวลผล (รวมถึงตัวผู้เล่นด้วย)
     try:
-        ai_analysis = ai_engine.predict_match(
+        ai_analysis = prediction_cache.get_or_predict(
             match_data, 
             real_odds=real_odds,
             injuries=injuries,
@@ -44,13 +201,8 @@ def analyze_match(
         print(f"AI Logic Error: {e}")
         raise HTTPException(status_code=500, detail=f"AI Calculation failed: {str(e)}")
 
-    # 5. ดึงข้อมูลสถิติการเจอกัน (H2H)
-    h2h_stats = []
-    if "home_id" in match_data and "away_id" in match_data:
-        h2h_stats = football_service.get_head_to_head(
-            match_data["home_id"], 
-            match_data["away_id"]
-        )
+    # 5. ข้อมูลสถิติการเจอกัน (H2H) ได้มาพร้อมกันแล้วด้านบน
+    h2h_stats = details["h2h"]
 
     # 6. ส่ง Data ทั้งหมดกลับไปที่ Frontend
     return {
@@ -60,5 +212,6 @@ def analyze_match(
         "history": h2h_stats,
         "injuries": injuries,   # ส่งไปโชว์ที่หน้าเว็บด้วย
         "lineups": lineups,     # ส่งไปโชว์ที่หน้าเว็บด้วย
-        "real_odds_debug": real_odds
+        "real_odds_debug": real_odds,
+        "missing_data": missing # ข้อมูลที่ดึงไม่ทัน Deadline (AI ใช้ค่า Default แทน)
     }
\ No newline at end of file
@@ -1,10 +1,126 @@
+import os
+
 import numpy as np
-from scipy.stats import poisson
+
+
+def poisson_pmf(lam, max_goals=10):
+    """ Poisson pmf ของ 0..max_goals-1 ประตู (lam เป็น scalar หรือ array ก็ได้) """
+    lam = np.asarray(lam, dtype=float)
+    ratios = lam[..., None] / np.arange(1, max_goals)
+    pmf = np.concatenate([np.ones(lam.shape + (1,)), np.cumprod(ratios, axis=-1)], axis=-1)
+    return pmf * np.exp(-lam)[..., None]
+
+
+def dixon_coles_tau(home_lambda, away_lambda, rho):
+    """
+    ตัวคูณปรับสกอร์ต่ำของ Dixon-Coles สำหรับช่อง 0-0, 0-1, 1-0, 1-1 -> array shape (..., 2, 2)
+    rho < 0: 0-0 / 1-1 เกิดบ่อยขึ้น และ 1-0 / 0-1 น้อยลง (เทียบกับ Poisson อิสระ)
+    """
+    home_lambda = np.asarray(home_lambda, dtype=float)
+    away_lambda = np.asarray(away_lambda, dtype=float)
+    rho = np.broadcast_to(np.asarray(rho, dtype=float), home_lambda.shape)
+    tau = np.empty(home_lambda.shape + (2, 2))
+    tau[..., 0, 0] = 1 - home_lambda * away_lambda * rho
+    tau[..., 0, 1] = 1 + home_lambda * rho
+    tau[..., 1, 0] = 1 + away_lambda * rho
+    tau[..., 1, 1] = 1 - rho
+    # rho ที่แรงเกินไปสำหรับ lambda คู่นี้ทำให้ความน่าจะเป็นติดลบได้ -> ตัดที่ 0
+    return np.clip(tau, 0.0, None)
+
+
+class ScoreMatrix:
+    """
+    ตารางความน่าจะเป็นของสกอร์ [home_goals, away_goals] สร้างครั้งเดียวจาก outer product
+    แล้วคิดทุกตลาด (1X2, O/U, Handicap, Exact Score, BTTS) ด้วย array reduction
+    รองรับ batch: lambda เป็น array shape (N,) จะได้ matrix shape (N, G, G)
+    rho != 0: ปรับช่องสกอร์ต่ำด้วย Dixon-Coles (ประตูของสองทีมไม่อิสระต่อกัน)
+    """
+    def __init__(self, home_lambda, away_lambda, max_goals=10, rho=0.0):
+        self.max_goals = max_goals
+        self.rho = rho
+        home_probs = poisson_pmf(home_lambda, max_goals)
+        away_probs = poisson_pmf(away_lambda, max_goals)
+        self.matrix = home_probs[..., :, None] * away_probs[..., None, :]
+        if np.any(np.asarray(rho) != 0):
+            # tau ที่ถูกตัดที่ 0 ทำให้ผลรวมเพี้ยน -> ปรับกลับให้ผลรวมเท่าก่อนปรับ (rho = 0 ไม่เข้าเงื่อนไขนี้ ผลเหมือนเดิม)
+            mass = self.matrix.sum(axis=(-2, -1), keepdims=True)
+            self.matrix[..., :2, :2] *= dixon_coles_tau(home_lambda, away_lambda, rho)
+            self.matrix *= mass / self.matrix.sum(axis=(-2, -1), keepdims=True)
+
+        goals = np.arange(max_goals)
+        self.goal_diff = goals[:, None] - goals[None, :]
+        self.total_goals = goals[:, None] + goals[None, :]
+
+    def _sum(self, mask):
+        return (self.matrix * mask).sum(axis=(-2, -1))
+
+    @staticmethod
+    def _line(line):
+        # line เป็น array (batch) ให้ broadcast กับแกนสกอร์ 2 แกนสุดท้าย
+        return np.asarray(line, dtype=float)[..., None, None]
+
+    def outcome_probs(self):
+        """ (home_win, draw, away_win) """
+        return self._sum(self.goal_diff > 0), self._sum(self.goal_diff == 0), self._sum(self.goal_diff < 0)
+
+    def over(self, line):
+        return self._sum(self.total_goals > self._line(line))
+
+    def under(self, line):
+        return self._sum(self.total_goals < self._line(line))
+
+    def handicap_cover(self, line):
+        """ โอกาสที่เจ้าบ้านชนะราคาต่อรอง (goal diff + line > 0) """
+        return self._sum(self.goal_diff + self._line(line) > 0)
+
+    def exact_score(self, home_goals, away_goals):
+        return self.matrix[..., home_goals, away_goals]
+
+    def btts(self):
+        return self.matrix[..., 1:, 1:].sum(axis=(-2, -1))
+
+    def top_scores(self, k=5):
+        """ k สกอร์ที่น่าจะเป็นที่สุด -> array (..., k) ของ home_goals, away_goals, probability """
+        flat = self.matrix.reshape(self.matrix.shape[:-2] + (-1,))
+        idx = np.argsort(-flat, axis=-1, kind="stable")[..., :k]
+        return idx // self.max_goals, idx % self.max_goals, np.take_along_axis(flat, idx, axis=-1)
+
 
 class AIEngine:
-    def __init__(self):
+    # ค่าที่ปรับจูนได้ (Backtest Runner ส่งค่าทับผ่าน --param name=value)
+    TUNABLE_PARAMS = ("ht_factor", "ht_threshold", "hdp_cover_high", "hdp_cover_low", "ou_over_high", "ou_over_low", "rho")
+
+    def __init__(self, ht_factor=0.45, ht_threshold=50.0, hdp_cover_high=65.0, hdp_cover_low=35.0,
+                 ou_over_high=60.0, ou_over_low=40.0, rho=None):
         self.league_avg_home_goals = 1.5
         self.league_avg_away_goals = 1.2
+        # ครึ่งแรก: สัดส่วนประตูของครึ่งแรก / % ขั้นต่ำที่ถือว่ามีโอกาสได้ประตู
+        self.ht_factor = ht_factor
+        self.ht_threshold = ht_threshold
+        # Handicap: % ที่ทีมเหย้าได้ราคา > high -> เชียร์เหย้า, < low -> เชียร์เยือน
+        self.hdp_cover_high = hdp_cover_high
+        self.hdp_cover_low = hdp_cover_low
+        # Over/Under: % ที่สูงกว่าไลน์ > high -> สูง, < low -> ต่ำ
+        self.ou_over_high = ou_over_high
+        self.ou_over_low = ou_over_low
+        # Score Matrix: จำนวนประตูสูงสุดต่อทีม (0..max_goals-1) / rho ของ Dixon-Coles (0 = Poisson อิสระ)
+        self.max_goals = 10
+        self.rho = float(os.getenv("DIXON_COLES_RHO", "0")) if rho is None else rho
+        # จำนวนสกอร์ที่ส่งกลับใน score_distribution.top_scores
+        self.top_k_scores = 5
+        # 📐 RatingEngine (ถ้ามี): ค่าเฉลี่ยประตูรายลีก + ค่าพลังทีมจาก Rating Model
+        self.ratings = None
+
+    def model_version(self, match_data):
+        """ เปลี่ยนเมื่อ Rating ที่แมตช์นี้ใช้อัปเดต (ใช้เป็นส่วนหนึ่งของ key ใน PredictionCache) """
+        if self.ratings is None: return 0
+        return self.ratings.version_for(match_data.get("league_id"), match_data.get("home_id"), match_data.get("away_id"))
+
+    def league_baselines(self, league_id):
+        """ ค่าเฉลี่ยประตู (เหย้า, เยือน) ของลีก / ค่าคงที่เดิมถ้าไม่มี RatingEngine """
+        if self.ratings is None:
+            return self.league_avg_home_goals, self.league_avg_away_goals
+        return self.ratings.baselines.get(league_id)
 
     def calculate_momentum_score(self, form_str: str):
         """ แปลงฟอร์มเป็นคะแนน (Return native float) """
@@ -36,17 +152,31 @@ class AIEngine:
             except: pass
         return "N/A"
 
-    def calculate_expected_goals(self, home_attack, away_defense, away_attack, home_defense):
-        home_lambda = home_attack * away_defense * self.league_avg_home_goals
-        away_lambda = away_attack * home_defense * self.league_avg_away_goals
-        return float(home_lambda), float(away_lambda)
+    def calculate_expected_goals(self, home_attack, away_defense, away_attack, home_defense,
+                                 home_avg=None, away_avg=None):
+        """ รับได้ทั้ง float และ NumPy array (สำหรับ predict_many) / home_avg, away_avg = ค่าเฉลี่ยของลีก """
+        home_avg = self.league_avg_home_goals if home_avg is None else home_avg
+        away_avg = self.league_avg_away_goals if away_avg is None else away_avg
+        home_lambda = np.asarray(home_attack, dtype=float) * away_defense * home_avg
+        away_lambda = np.asarray(away_attack, dtype=float) * home_defense * away_avg
+        if home_lambda.ndim == 0:
+            return float(home_lambda), float(away_lambda)
+        return home_lambda, away_lambda
 
-    def predict_match(self, match_data, real_odds=None, injuries=None, lineups=None):
+    def _prepare_match_inputs(self, match_data, injuries=None, lineups=None):
+        """ ปรับค่าพลังทีมตาม ฟอร์ม / ตัวเจ็บ / ไลน์อัป (ส่วนที่ต้องทำทีละแมตช์) """
         home_team = match_data['home_team']
         away_team = match_data['away_team']
         home_stats = match_data['home_stats'].copy()
         away_stats = match_data['away_stats'].copy()
 
+        # 📐 0. Rating Model (ถ้าเปิดใช้และทีมมีข้อมูลพอ) แทนค่าพลังจากตารางคะแนน
+        if self.ratings is not None:
+            for side, stats in (("home", home_stats), ("away", away_stats)):
+                rated = self.ratings.strength(match_data.get(f"{side}_id"))
+                if rated is not None:
+                    stats['attack'], stats['defense'] = rated
+
         # 🔥 1. Momentum Analysis
         home_form = home_stats.get("form", "-----")
         away_form = away_stats.get("form", "-----")
@@ -85,28 +215,115 @@ class AIEngine:
                     home_stats['defense'] = float(home_stats['defense'] * 0.9)
             except: pass
 
-        # 4. คำนวณความน่าจะเป็น (Poisson)
+        return {
+            "home_team": home_team,
+            "away_team": away_team,
+            "home_stats": home_stats,
+            "away_stats": away_stats,
+            "home_form": home_form,
+            "away_form": away_form,
+            "momentum_insight": momentum_insight,
+            "lineup_insight": lineup_insight,
+        }
+
+    def predict_match(self, match_data, real_odds=None, injuries=None, lineups=None):
+        return self.predict_many([match_data], [real_odds], [injuries], [lineups])[0]
+
+    def predict_many(self, matches, real_odds=None, injuries=None, lineups=None):
+        """
+        🔥 วิเคราะห์ทั้ง Slate ในรอบเดียว
+        คำนวณ lambda / ครึ่งแรก / ทุกตลาด เป็น array shape (N,) และ Score Matrix (N, G, G)
+        real_odds, injuries, lineups เป็น list ที่เรียงตรงกับ matches (หรือ None)
+        คืนค่า list ของ dict หน้าตาเดียวกับ predict_match
+        """
+        n = len(matches)
+        if n == 0: return []
+        real_odds = real_odds or [None] * n
+        injuries = injuries or [None] * n
+        lineups = lineups or [None] * n
+
+        inputs = [
+            self._prepare_match_inputs(m, injuries=inj, lineups=lu)
+            for m, inj, lu in zip(matches, injuries, lineups)
+        ]
+
+        # 4. คำนวณความน่าจะเป็น (Poisson) ทั้ง Batch
+        home_attack = np.array([x["home_stats"]['attack'] for x in inputs], dtype=float)
+        home_defense = np.array([x["home_stats"]['defense'] for x in inputs], dtype=float)
+        away_attack = np.array([x["away_stats"]['attack'] for x in inputs], dtype=float)
+        away_defense = np.array([x["away_stats"]['defense'] for x in inputs], dtype=float)
+
+        baselines = np.array([self.league_baselines(m.get("league_id")) for m in matches], dtype=float)
         home_lambda, away_lambda = self.calculate_expected_goals(
-            home_stats['attack'], away_stats['defense'],
-            away_stats['attack'], home_stats['defense']
+            home_attack, away_defense, away_attack, home_defense,
+            home_avg=baselines[:, 0], away_avg=baselines[:, 1]
         )
-        home_lambda = float(home_lambda * 1.1) # Home Advantage
+        home_lambda = home_lambda * 1.1 # Home Advantage
 
         # 🔥 5. First Half Analysis
-        ht_factor = 0.45 
-        ht_home_lambda = home_lambda * ht_factor
-        ht_away_lambda = away_lambda * ht_factor
-        
-        total_ht_lambda = ht_home_lambda + ht_away_lambda
-        prob_0_goal_ht = poisson.pmf(0, total_ht_lambda)
-        prob_goal_ht = (1 - prob_0_goal_ht) * 100 
+        total_ht_lambda = (home_lambda + away_lambda) * self.ht_factor
+        prob_goal_ht = (1 - np.exp(-total_ht_lambda)) * 100
+
+        # 6. Full Match Simulation: Score Matrix (N, G, G) แล้วคิดทุกตลาดจากตารางนี้
+        scores = ScoreMatrix(home_lambda, away_lambda, self.max_goals, rho=self.rho)
+        top_home, top_away, top_prob = scores.top_scores(self.top_k_scores)
+
+        home_win_prob, draw_prob, away_win_prob = scores.outcome_probs()
+        over_2_5_prob = scores.over(2.5)
+        btts_prob = scores.btts()
+
+        hdp_lines = np.array([
+            float(o["handicap"]["line"]) if o and o.get("handicap") else np.nan for o in real_odds
+        ])
+        ou_lines = np.array([
+            float(o["over_under"]["line"]) if o and o.get("over_under") else 2.5 for o in real_odds
+        ])
+        hdp_cover = scores.handicap_cover(np.nan_to_num(hdp_lines)) * 100
+        ou_over = scores.over(ou_lines) * 100
+
+        return [
+            self._build_prediction(
+                inputs[k],
+                home_lambda=float(home_lambda[k]),
+                away_lambda=float(away_lambda[k]),
+                prob_goal_ht=float(prob_goal_ht[k]),
+                outcome=(float(home_win_prob[k]), float(draw_prob[k]), float(away_win_prob[k])),
+                over_2_5_prob=float(over_2_5_prob[k]),
+                btts_prob=float(btts_prob[k]),
+                hdp_line=None if np.isnan(hdp_lines[k]) else float(hdp_lines[k]),
+                prob_cover=float(hdp_cover[k]),
+                target_line=float(ou_lines[k]),
+                ou_prob_pct=float(ou_over[k]),
+                score_distribution=self._score_distribution(
+                    scores.matrix[k], top_home[k], top_away[k], top_prob[k]
+                ),
+            )
+            for k in range(n)
+        ]
+
+    def _score_distribution(self, matrix, top_home, top_away, top_prob):
+        """ ตารางสกอร์ทั้งหมด (แถว = ประตูเจ้าบ้าน, คอลัมน์ = ประตูทีมเยือน) + สกอร์ที่น่าจะเป็นที่สุด """
+        return {
+            "model": "dixon_coles" if self.rho else "poisson",
+            "rho": float(self.rho),
+            "max_goals": int(self.max_goals),
+            "matrix": np.round(matrix, 5).tolist(),
+            "top_scores": [
+                {"score": f"{int(h)} - {int(a)}", "probability": float(round(p * 100, 1))}
+                for h, a, p in zip(top_home, top_away, top_prob)
+            ],
+        }
+
+    def _build_prediction(self, inputs, home_lambda, away_lambda, prob_goal_ht, outcome,
+                          over_2_5_prob, btts_prob, hdp_line, prob_cover, target_line, ou_prob_pct,
+                          score_distribution=None):
+        """ ตัดสินใจ Pick จากตัวเลขที่คำนวณแล้ว (ต่อแมตช์) """
+        home_team = inputs["home_team"]
+        away_team = inputs["away_team"]
+        home_win_prob, draw_prob, away_win_prob = outcome
 
         # ⚠️ ปรับ Threshold ลงเหลือ 50% เพื่อทดสอบ
-        threshold = 50.0 
-        is_high_chance = prob_goal_ht > threshold
-        
-        # 🖨️ Print Debug: ดูใน Terminal ว่าคู่ไหนได้กี่ %
-        print(f"DEBUG 1H: {home_team} vs {away_team} -> {prob_goal_ht:.1f}% (Pass: {is_high_chance})")
+        is_high_chance = prob_goal_ht > self.ht_threshold
 
         ht_analysis = {
             "has_value": bool(is_high_chance), 
@@ -114,47 +331,28 @@ class AIEngine:
             "text": "High Chance" if prob_goal_ht > 65 else "Moderate Chance"
         }
 
-        # 6. Full Match Simulation & Odds Analysis
-        max_goals = 10
-        home_probs = [poisson.pmf(i, home_lambda) for i in range(max_goals)]
-        away_probs = [poisson.pmf(i, away_lambda) for i in range(max_goals)]
-
-        home_win_prob = 0.0
-        draw_prob = 0.0
-        away_win_prob = 0.0
-        over_2_5_prob = 0.0
-        diff_probs = {}
-
-        for i in range(max_goals):
-            for j in range(max_goals):
-                prob = float(home_probs[i] * away_probs[j])
-                if i > j: home_win_prob += prob
-                elif i == j: draw_prob += prob
-                else: away_win_prob += prob
-                
-                if (i + j) > 2.5: over_2_5_prob += prob
-                diff = i - j
-                diff_probs[diff] = diff_probs.get(diff, 0.0) + prob
-
         # 7. AI Decision Making
         advice = "No Advice"
         confidence = "Low"
+        # Pick แบบมีโครงสร้าง (ใช้ตรวจผล / Backtest โดยไม่ต้อง Parse ข้อความ)
+        pick = None
         
         # 7.1 Handicap / Winner
         hdp_text = "N/A"
         hdp_diff = float(home_lambda - away_lambda)
         
-        if real_odds and real_odds.get("handicap"):
-            line = float(real_odds["handicap"]["line"])
-            prob_cover = sum(p for d, p in diff_probs.items() if d + line > 0) * 100
+        if hdp_line is not None:
+            line = hdp_line
             
-            if prob_cover > 65:
+            if prob_cover > self.hdp_cover_high:
                 advice = f"HANDICAP: {home_team} {line}"
                 confidence = "High"
+                pick = {"market": "handicap", "side": "home", "line": float(line)}
                 hdp_text = f"Bet: {home_team} {line} ({prob_cover:.1f}%)"
-            elif prob_cover < 35:
+            elif prob_cover < self.hdp_cover_low:
                 advice = f"HANDICAP: {away_team} {-line}"
                 confidence = "High"
+                pick = {"market": "handicap", "side": "away", "line": float(-line)}
                 hdp_text = f"Bet: {away_team} {-line} ({100-prob_cover:.1f}%)"
             else:
                 hdp_text = f"Skipped Line {line}"
@@ -166,27 +364,18 @@ class AIEngine:
             else: hdp_text = "0.0 (Level)"
 
         # 7.2 Over/Under
-        target_line = 2.5
-        if real_odds and real_odds.get("over_under"):
-            target_line = float(real_odds["over_under"]["line"])
-        
-        prob_over_line = 0.0
-        for i in range(max_goals):
-            for j in range(max_goals):
-                if (i + j) > target_line:
-                    prob_over_line += float(home_probs[i] * away_probs[j])
-        
-        ou_prob_pct = prob_over_line * 100
         ou_text = f"Over {target_line}: {ou_prob_pct:.1f}%"
 
-        if ou_prob_pct > 60:
+        if ou_prob_pct > self.ou_over_high:
             if confidence == "Low": 
                 advice = f"GOAL: OVER {target_line}"
                 confidence = "Medium"
-        elif ou_prob_pct < 40:
+                pick = {"market": "over_under", "side": "over", "line": float(target_line)}
+        elif ou_prob_pct < self.ou_over_low:
              if confidence == "Low":
                 advice = f"GOAL: UNDER {target_line}"
                 confidence = "Medium"
+                pick = {"market": "over_under", "side": "under", "line": float(target_line)}
 
         return {
             "teams": f"{home_team} vs {away_team}",
@@ -197,8 +386,10 @@ class AIEngine:
             },
             "first_half_analysis": ht_analysis,
             "expected_score": f"{round(home_lambda)} - {round(away_lambda)}",
+            "score_distribution": score_distribution,
             "goals_market": {
                 "over_2_5": float(round(over_2_5_prob * 100, 1)),
+                "btts": float(round(btts_prob * 100, 1)),
                 "real_line": float(target_line),
                 "probability": float(round(ou_prob_pct, 1)),
                 "analysis": ou_text
@@ -209,12 +400,13 @@ class AIEngine:
             },
             "ai_insight": {
                 "main_pick": advice,
+                "pick": pick,
                 "confidence": confidence,
-                "momentum_analysis": momentum_insight,
-                "lineup_analysis": lineup_insight
+                "momentum_analysis": inputs["momentum_insight"],
+                "lineup_analysis": inputs["lineup_insight"]
             },
             "form_analysis": {
-                "home": home_form,
-                "away": away_form
+                "home": inputs["home_form"],
+                "away": inputs["away_form"]
             }
         }
\ No newline at end of file
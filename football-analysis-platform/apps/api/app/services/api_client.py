@@ -0,0 +1,94 @@
+import asyncio
+import random
+from typing import Optional
+
+import httpx
+
+
+class UpstreamError(Exception):
+    """ api-sports ตอบกลับผิดปกติ (หลัง Retry ครบแล้ว) """
+
+
+class UpstreamRateLimited(UpstreamError):
+    """ Bucket ของ Endpoint นี้หมด (ไม่ได้ยิงออกไปจริง ผู้เรียกใช้ Cache / ค่า Default แทน) """
+
+
+class ApiSportsClient:
+    """
+    🌐 Async Client สำหรับ api-sports (ใช้ httpx.AsyncClient ตัวเดียวทั้ง Process)
+    - Connection Pool + Keep-alive (ไม่ต้อง TLS Handshake ใหม่ทุกครั้ง)
+    - Timeout ทุก Call (กำหนดต่อ Call ได้)
+    - Retry + Exponential Backoff สำหรับ Network Error / 429 / 5xx
+    - จำกัดจำนวน Request ที่ยิงพร้อมกัน (Semaphore)
+    - limiter (Optional): Token Bucket ต่อ Endpoint นับทุกครั้งที่ยิงจริง รวม Retry
+    - quota (Optional): รายงานทุก Response (Endpoint + Header โควตา) ให้ QuotaManager
+    """
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_key: Optional[str], base_url: str,
+                 timeout: float = 10.0, max_connections: int = 20,
+                 max_concurrency: int = 10, retries: int = 2, backoff: float = 0.5):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.limiter = None
+        self.quota = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # สร้างตอนใช้ครั้งแรก (ต้องอยู่ใน Event Loop ที่รันจริง)
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"x-rapidapi-key": self.api_key or "", "x-rapidapi-host": "v3.football.api-sports.io"},
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return self._client
+
+    async def get(self, path: str, params: Optional[dict] = None, timeout: Optional[float] = None) -> dict:
+        """ GET แล้วคืน JSON (dict) / raise UpstreamError ถ้าพังหลัง Retry ครบ """
+        client = self._get_client()
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                # SQLite Backend มี I/O -> ทำใน Thread (ไม่บล็อก Event Loop)
+                if self.limiter.blocking:
+                    limit = await asyncio.to_thread(self.limiter.hit, "upstream", path)
+                else:
+                    limit = self.limiter.hit("upstream", path)
+                if not limit.allowed:
+                    raise UpstreamRateLimited(f"{path} -> upstream budget exhausted, retry in {limit.retry_after:.0f}s")
+            try:
+                async with self._semaphore:
+                    res = await client.get(path, params=params, timeout=timeout or self.timeout)
+                if self.quota is not None:
+                    self.quota.record(path, res.status_code, res.headers)
+                if res.status_code in self.RETRY_STATUS:
+                    last_error = UpstreamError(f"{path} -> HTTP {res.status_code}")
+                else:
+                    res.raise_for_status()
+                    return res.json()
+            except httpx.TransportError as e:
+                last_error = e
+            except (httpx.HTTPStatusError, ValueError) as e:
+                # 4xx / JSON พัง: Retry ไปก็ไม่ช่วย
+                raise UpstreamError(f"{path} -> {e}") from e
+
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt) + random.uniform(0, self.backoff))
+
+        raise UpstreamError(f"{path} failed after {self.retries + 1} attempts: {last_error}")
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ที่เก็บ Archive (แยกจาก DB หลักของแอป)
+DEFAULT_ARCHIVE_PATH = os.getenv("FIXTURE_ARCHIVE_PATH", os.path.join("data_cache", "archive.db"))
+
+FINISHED_STATUSES = ("FT", "AET", "PEN")
+# kind ที่เก็บทุกครั้งที่ดึง (ต้องการประวัติการขยับราคา) / kind อื่นเก็บเฉพาะตอนค่าเปลี่ยน
+APPEND_ONLY_KINDS = ("odds",)
+
+
+class FixtureArchive:
+    """
+    🗄️ Archive ในเครื่องของทุกอย่างที่ดึงจาก api-sports (ไม่ Delete)
+    1 แถว = 1 ค่าที่ดึงมา -> record ล่าสุดของ (kind, fixture_id) คือค่าปัจจุบัน
+    - ดึงซ้ำแล้ว payload เหมือน record ล่าสุด: แค่ต่ออายุ fetched_at (ไม่เพิ่มแถว)
+    - odds: เพิ่มแถวทุก Snapshot (Append-only)
+    kind:
+    - fixture:     item ดิบของ /fixtures (ผลการแข่งขัน / สถานะ)
+    - history:     match dict ที่พร้อมวิเคราะห์ (มี home_stats / away_stats ณ เวลาที่ดึง) ใช้ Replay / Backtest
+    - history_day: ตัวบอกว่าแมตช์ FT ของวันนั้นถูกเก็บครบแล้ว
+    - odds / lineups / injuries: ข้อมูลต่อแมตช์ (odds เก็บทุก Snapshot)
+    Index ตาม fixture id / team id / วันที่ / ลีก
+    """
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    fixture_id INTEGER,
+                    match_date TEXT,
+                    home_id INTEGER,
+                    away_id INTEGER,
+                    league_id INTEGER,
+                    status TEXT,
+                    fetched_at REAL NOT NULL,
+                    payload TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_records_fixture ON records (kind, fixture_id, id);
+                CREATE INDEX IF NOT EXISTS ix_records_date ON records (kind, match_date, league_id);
+                CREATE INDEX IF NOT EXISTS ix_records_home ON records (kind, home_id);
+                CREATE INDEX IF NOT EXISTS ix_records_away ON records (kind, away_id);
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- ✍️ Write ---
+
+    def _append(self, rows):
+        if not rows: return
+        now = time.time()
+        with self._lock, self._conn:
+            for row, payload in rows:
+                payload = json.dumps(payload, ensure_ascii=False)
+                kind, fixture_id = row[0], row[1]
+                if fixture_id is not None and kind not in APPEND_ONLY_KINDS:
+                    latest = self._conn.execute(
+                        "SELECT id, payload FROM records WHERE kind = ? AND fixture_id = ? ORDER BY id DESC LIMIT 1",
+                        (kind, fixture_id),
+                    ).fetchone()
+                    if latest is not None and latest[1] == payload:
+                        self._conn.execute("UPDATE records SET fetched_at = ? WHERE id = ?", (now, latest[0]))
+                        continue
+                self._conn.execute(
+                    "INSERT INTO records (kind, fixture_id, match_date, home_id, away_id, league_id, status, fetched_at, payload)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row + (now, payload),
+                )
+
+    def add_fixtures(self, items):
+        """ item ดิบจาก /fixtures หรือ /fixtures/headtohead """
+        self._append([
+            (("fixture", item["fixture"]["id"], item["fixture"]["date"][:10],
+              item["teams"]["home"]["id"], item["teams"]["away"]["id"],
+              item["league"]["id"], item["fixture"]["status"]["short"]), item)
+            for item in items
+        ])
+
+    def add_history(self, date_str, matches, complete=False):
+        """ แมตช์ที่จบแล้วแบบพร้อมวิเคราะห์ของวันนั้น (complete=True: เก็บครบทั้งวันแล้ว) """
+        rows = [
+            (("history", m["id"], date_str, m.get("home_id"), m.get("away_id"), m.get("league_id"), "FT"), m)
+            for m in matches
+        ]
+        if complete:
+            rows.append((("history_day", None, date_str, None, None, None, None), len(matches)))
+        self._append(rows)
+
+    def add(self, kind, fixture_id, payload):
+        """ ข้อมูลต่อแมตช์: odds / lineups / injuries """
+        self._append([((kind, fixture_id, None, None, None, None, None), payload)])
+
+    # --- 🔎 Read ---
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def latest(self, kind, fixture_id, max_age=None):
+        """ (fetched_at, payload) ล่าสุดของแมตช์ / None ถ้าไม่มีหรือเก่ากว่า max_age """
+        rows = self._query(
+            "SELECT fetched_at, payload FROM records WHERE kind = ? AND fixture_id = ? ORDER BY id DESC LIMIT 1",
+            (kind, fixture_id),
+        )
+        if not rows: return None
+        fetched_at, payload = rows[0]
+        if max_age is not None and time.time() - fetched_at > max_age: return None
+        return fetched_at, json.loads(payload)
+
+    def is_finished(self, fixture_id):
+        rows = self._query(
+            "SELECT status FROM records WHERE kind = 'fixture' AND fixture_id = ? ORDER BY id DESC LIMIT 1",
+            (fixture_id,),
+        )
+        return bool(rows) and rows[0][0] in FINISHED_STATUSES
+
+    def has_history_day(self, date_str):
+        return bool(self._query(
+            "SELECT 1 FROM records WHERE kind = 'history_day' AND match_date = ? LIMIT 1", (date_str,)
+        ))
+
+    def history(self, start, end, league_ids=None):
+        """ แมตช์ที่จบแล้ว (ล่าสุดต่อ fixture) ในช่วงวันที่ เรียงตาม (วันที่, fixture id) """
+        sql = (
+            "SELECT match_date, payload FROM records WHERE id IN ("
+            " SELECT MAX(id) FROM records WHERE kind = 'history' AND match_date BETWEEN ? AND ?"
+        )
+        params = [start, end]
+        if league_ids:
+            sql += f" AND league_id IN ({','.join('?' * len(league_ids))})"
+            params.extend(league_ids)
+        sql += " GROUP BY fixture_id) ORDER BY match_date, fixture_id"
+        return [(match_date, json.loads(payload)) for match_date, payload in self._query(sql, params)]
+
+    def head_to_head(self, team1_id, team2_id, limit=5):
+        """ แมตช์ที่จบแล้วระหว่าง 2 ทีม (item ดิบ ล่าสุดก่อน) """
+        rows = self._query(
+            "SELECT payload FROM records WHERE id IN ("
+            " SELECT MAX(id) FROM records WHERE kind = 'fixture'"
+            " AND ((home_id = ? AND away_id = ?) OR (home_id = ? AND away_id = ?))"
+            " GROUP BY fixture_id)"
+            f" AND status IN ({','.join('?' * len(FINISHED_STATUSES))})"
+            " ORDER BY match_date DESC LIMIT ?",
+            (team1_id, team2_id, team2_id, team1_id, *FINISHED_STATUSES, limit),
+        )
+        return [json.loads(payload) for (payload,) in rows]
+
+    def finished_fixtures(self):
+        """ item ดิบของทุกแมตช์ที่จบแล้ว (ล่าสุดต่อ fixture) ใช้ Rebuild Rating """
+        rows = self._query(
+            "SELECT payload FROM records WHERE id IN ("
+            " SELECT MAX(id) FROM records WHERE kind = 'fixture' GROUP BY fixture_id)"
+            f" AND status IN ({','.join('?' * len(FINISHED_STATUSES))})"
+            " ORDER BY match_date",
+            FINISHED_STATUSES,
+        )
+        return [json.loads(payload) for (payload,) in rows]
+
+    def stats(self):
+        return dict(self._query("SELECT kind, COUNT(*) FROM records GROUP BY kind"))
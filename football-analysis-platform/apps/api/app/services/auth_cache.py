@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event, select
+from starlette.concurrency import run_in_threadpool
+
+from app.database import AsyncSessionLocal, SessionLocal, async_enabled
+from app.models import User
+from app.services.refresher import SingleFlight
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """ Snapshot ของ User (ไม่ผูกกับ Session) ใช้แชร์ข้าม Request ได้ """
+    id: int
+    username: str
+    email: str
+    is_premium: bool
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_model(cls, user: User):
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_premium=bool(user.is_premium),
+            created_at=user.created_at,
+        )
+
+
+class TTLCache:
+    """ LRU + อายุต่อ Entry (expires_at เป็น time.monotonic()) """
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None: return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class AuthCache:
+    """
+    🔐 ตรวจ Token โดยไม่บล็อก Event Loop
+    - Token ที่ Decode แล้ว: cache ไว้ TOKEN_CACHE_TTL วินาที (ไม่เกินเวลา exp ของ Token)
+    - User: cache เป็น CurrentUser ไว้ USER_CACHE_TTL วินาที / Query DB ใน Threadpool
+      และ Request ที่ถาม User คนเดียวกันพร้อมกันรอผล Query เดียวกัน (SingleFlight)
+    - User ถูกแก้ผ่าน ORM (เช่นอัปเกรด Premium / แก้โปรไฟล์) -> ลบออกจาก Cache ทันที
+      (Worker อื่นเห็นค่าใหม่ภายใน USER_CACHE_TTL)
+    """
+    def __init__(self, token_ttl=None, user_ttl=None, max_size=10000):
+        self.token_ttl = token_ttl if token_ttl is not None else float(os.getenv("TOKEN_CACHE_TTL", "300"))
+        self.user_ttl = user_ttl if user_ttl is not None else float(os.getenv("USER_CACHE_TTL", "60"))
+        self.tokens = TTLCache(max_size)
+        self.users = TTLCache(max_size)
+        self._loads = SingleFlight()
+        self._watching = False
+
+    # --- 🎟️ Token ---
+
+    def decode(self, token, decoder):
+        """ payload ของ Token (decoder ใช้ตอนยังไม่มีใน Cache / โยน Error ต่อถ้า Token ไม่ถูกต้อง) """
+        payload = self.tokens.get(token)
+        if payload is None:
+            payload = decoder(token)
+            ttl = self.token_ttl
+            if payload.get("exp") is not None:
+                ttl = min(ttl, payload["exp"] - time.time())
+            if ttl > 0:
+                self.tokens.put(token, payload, ttl)
+        return payload
+
+    # --- 👤 User ---
+
+    @staticmethod
+    def _load_user(user_id):
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.id == user_id).first()
+            return CurrentUser.from_model(user) if user is not None else None
+        finally:
+            db.close()
+
+    @staticmethod
+    async def _load_user_async(user_id):
+        async with AsyncSessionLocal() as db:
+            user = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+            return CurrentUser.from_model(user) if user is not None else None
+
+    async def get_user(self, user_id):
+        """ CurrentUser หรือ None ถ้าไม่มี User นี้ (ไม่ cache ผลที่ไม่เจอ) """
+        user = self.users.get(user_id)
+        if user is None:
+            # Async Session ถ้าเปิด DB_ASYNC ไม่งั้น Session ปกติใน Threadpool
+            if async_enabled():
+                load = lambda: self._load_user_async(user_id)
+            else:
+                load = lambda: run_in_threadpool(self._load_user, user_id)
+            user = await self._loads.run(("user", user_id), load)
+            if user is not None:
+                self.users.put(user_id, user, self.user_ttl)
+        return user
+
+    def put_user(self, user: User):
+        self.users.put(user.id, CurrentUser.from_model(user), self.user_ttl)
+
+    def invalidate_user(self, user_id):
+        self.users.pop(user_id)
+
+    def _on_user_change(self, mapper, connection, target):
+        self.invalidate_user(target.id)
+
+    def watch(self):
+        """ ฟัง ORM Event ของ User (update / delete) เพื่อลบ Cache """
+        if self._watching: return
+        event.listen(User, "after_update", self._on_user_change)
+        event.listen(User, "after_delete", self._on_user_change)
+        self._watching = True
+
+    def unwatch(self):
+        if not self._watching: return
+        event.remove(User, "after_update", self._on_user_change)
+        event.remove(User, "after_delete", self._on_user_change)
+        self._watching = False
@@ -0,0 +1,189 @@
+import asyncio
+import json
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.models import BacktestDay, BacktestResult
+
+# INSERT ... ON CONFLICT DO NOTHING ต่อ Dialect (DB อื่นใช้ Savepoint ทีละแถว)
+CONFLICT_INSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+
+# ราคาที่ใช้คิด ROI เมื่อไม่มีราคาจริงของตลาดนั้น (ราคามาตรฐานของ Asian Handicap / O/U)
+DEFAULT_ODDS = 1.90
+
+WIN_OUTCOMES = ("Win", "Half Win")
+LOSS_OUTCOMES = ("Loss", "Half Loss")
+
+
+def split_line(line):
+    """ Asian Quarter Line แบ่งเดิมพันครึ่งๆ: -0.75 -> (-0.5, -1.0) / 2.25 -> (2.0, 2.5) """
+    if (line * 4) % 2 == 1:
+        return (line - 0.25, line + 0.25)
+    return (line,)
+
+def grade_pick(pick, score_home, score_away, odds=DEFAULT_ODDS):
+    """
+    ตรวจผล Pick แบบมีโครงสร้าง ({"market", "side", "line"}) กับสกอร์จริง
+    คืนค่า (outcome, profit ต่อเดิมพัน 1 unit)
+    """
+    if not pick or score_home is None or score_away is None:
+        return "N/A", 0.0
+
+    if pick["market"] == "handicap":
+        diff = score_home - score_away if pick["side"] == "home" else score_away - score_home
+        margins = [diff + line for line in split_line(pick["line"])]
+    elif pick["side"] == "over":
+        margins = [score_home + score_away - line for line in split_line(pick["line"])]
+    else:
+        margins = [line - (score_home + score_away) for line in split_line(pick["line"])]
+
+    stake = 1.0 / len(margins)
+    profit = sum((odds - 1) * stake if m > 0 else -stake if m < 0 else 0.0 for m in margins)
+    result = sum((m > 0) - (m < 0) for m in margins) / len(margins)
+    outcome = {1: "Win", 0.5: "Half Win", 0: "Push", -0.5: "Half Loss", -1: "Loss"}[result]
+    return outcome, round(profit, 4)
+
+
+def result_values(match, prediction, match_date, odds=DEFAULT_ODDS):
+    """ แมตช์ที่จบแล้ว + ผลวิเคราะห์ -> ค่าของแถว backtest_results """
+    pick = prediction["ai_insight"].get("pick")
+    outcome, profit = grade_pick(pick, match.get("score_home"), match.get("score_away"), odds)
+    return dict(
+        fixture_id=match["id"],
+        match_date=match_date,
+        league_id=match.get("league_id"),
+        league=match.get("league"),
+        home_team=match.get("home_team"),
+        away_team=match.get("away_team"),
+        score_home=match.get("score_home"),
+        score_away=match.get("score_away"),
+        main_pick=prediction["ai_insight"]["main_pick"],
+        market=pick["market"] if pick else None,
+        side=pick["side"] if pick else None,
+        line=pick["line"] if pick else None,
+        odds=odds,
+        outcome=outcome,
+        profit=profit,
+        match_json=json.dumps(match, ensure_ascii=False),
+    )
+
+def insert_ignore(db: Session, model, rows, key):
+    """ เพิ่มหลายแถว ข้ามแถวที่ key ซ้ำ (Request อื่นเก็บไปก่อนแล้ว) """
+    if not rows: return
+    conflict_insert = CONFLICT_INSERTS.get(db.get_bind().dialect.name)
+    if conflict_insert is not None:
+        db.execute(conflict_insert(model).values(rows).on_conflict_do_nothing(index_elements=[key]))
+    else:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.add(model(**row))
+            except IntegrityError:
+                pass
+    db.commit()
+
+
+class BacktestService:
+    """
+    📈 ตรวจผลแมตช์ที่จบแล้วครั้งเดียว แล้วเก็บลงตาราง backtest_results
+    หน้า History อ่านจาก DB / สรุปผล (Hit Rate, ROI) ใช้ SQL Aggregation
+    """
+    def __init__(self, football_service, ai_engine):
+        self.football_service = football_service
+        self.ai_engine = ai_engine
+
+    @staticmethod
+    def is_complete(db: Session, date_str):
+        return db.get(BacktestDay, date_str) is not None
+
+    def _store(self, db: Session, date_str, pending, predictions, complete, total):
+        insert_ignore(db, BacktestResult, [
+            result_values(match, prediction, date_str) for match, prediction in zip(pending, predictions)
+        ], "fixture_id")
+        if complete:
+            insert_ignore(db, BacktestDay, [{"match_date": date_str, "fixtures": total}], "match_date")
+        return self.get_results(db, date_str, date_str)
+
+    async def grade_date(self, db: Session, date_str: str):
+        """
+        คืนผลของวันนั้นจาก DB (ดึง/วิเคราะห์/ตรวจเฉพาะแมตช์ที่ยังไม่เคยเก็บ)
+        DB และ predict_many รันใน Thread / วันที่ตรวจครบแล้ว (BacktestDay) อ่านจาก DB อย่างเดียว
+        """
+        rows = await run_in_threadpool(self.get_results, db, date_str, date_str)
+        if await run_in_threadpool(self.is_complete, db, date_str):
+            return rows
+
+        matches = await self.football_service.get_history_matches(date_str)
+        # Archive เก็บแมตช์ FT ครบทั้งวันแล้ว = วันปิดแล้ว ตรวจครั้งนี้ครบก็ไม่ต้องดึงอีก
+        complete = self.football_service.archive.has_history_day(date_str)
+        known = {r.fixture_id for r in rows}
+        pending = [m for m in matches if m["id"] not in known]
+        if not pending and not complete:
+            return rows
+
+        predictions = await asyncio.to_thread(self.ai_engine.predict_many, pending) if pending else []
+        return await run_in_threadpool(self._store, db, date_str, pending, predictions, complete, len(matches))
+
+    def get_results(self, db: Session, start: str, end: str, league=None):
+        query = db.query(BacktestResult).filter(BacktestResult.match_date.between(start, end))
+        if league is not None:
+            query = query.filter(BacktestResult.league == league)
+        return query.order_by(BacktestResult.match_date, BacktestResult.fixture_id).all()
+
+    @staticmethod
+    def summarize_day(rows):
+        """ สรุปแบบเดิมของหน้า History: win / loss / draw (push) / total """
+        summary = {"win": 0, "loss": 0, "draw": 0, "total": 0}
+        for r in rows:
+            if r.outcome in WIN_OUTCOMES: summary["win"] += 1
+            elif r.outcome in LOSS_OUTCOMES: summary["loss"] += 1
+            elif r.outcome == "Push": summary["draw"] += 1
+            if r.outcome != "N/A": summary["total"] += 1
+        return summary
+
+    def summarize(self, db: Session, start: str, end: str):
+        """ Hit Rate / ROI รวม, แยกตามตลาด และแยกตามลีก (GROUP BY ใน DB) """
+        won = func.sum(case((BacktestResult.outcome.in_(WIN_OUTCOMES), 1), else_=0))
+        lost = func.sum(case((BacktestResult.outcome.in_(LOSS_OUTCOMES), 1), else_=0))
+        columns = (func.count(BacktestResult.id), won, lost, func.sum(BacktestResult.profit))
+
+        def aggregate(*group_by):
+            query = db.query(*group_by, *columns).filter(
+                BacktestResult.match_date.between(start, end),
+                BacktestResult.market.isnot(None),
+            )
+            if group_by:
+                query = query.group_by(*group_by).order_by(*group_by)
+            return query.all()
+
+        def to_stats(bets, won, lost, profit):
+            bets, won, lost, profit = bets or 0, won or 0, lost or 0, profit or 0.0
+            decided = won + lost
+            return {
+                "bets": bets,
+                "win": won,
+                "loss": lost,
+                "push": bets - decided,
+                "hit_rate": round(won / decided * 100, 1) if decided else None,
+                "profit": round(profit, 2),
+                "roi": round(profit / bets * 100, 1) if bets else None,
+            }
+
+        return {
+            "start": start,
+            "end": end,
+            "overall": to_stats(*aggregate()[0]),
+            "by_market": [
+                {"market": market, **to_stats(*rest)}
+                for market, *rest in aggregate(BacktestResult.market)
+            ],
+            "by_league": [
+                {"league": league, **to_stats(*rest)}
+                for league, *rest in aggregate(BacktestResult.league)
+            ],
+        }
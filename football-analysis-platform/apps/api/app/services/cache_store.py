@@ -0,0 +1,163 @@
+"""
+💾 Cache Store: key -> JSON ใน SQLite ไฟล์เดียว (WAL) ใช้ร่วมกันได้ทุก uvicorn Worker
+โฟลเดอร์ JSON เดิม (1 ไฟล์ต่อ key) ยังใช้เป็นรูปแบบ Import / Export ได้:
+    python -m app.services.cache_store export data_cache_backup
+    python -m app.services.cache_store import data_cache
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.getenv("CACHE_STORE_PATH", os.path.join("data_cache", "cache.db"))
+
+
+class CacheStore:
+    """
+    - เขียนแต่ละ key เป็น Transaction เดียว (Atomic): ผู้อ่านเห็นค่าเก่าครบ หรือค่าใหม่ครบ ไม่มีครึ่งๆ
+    - WAL: อ่านพร้อมกันหลาย Process ได้ขณะมีคนเขียน / busy_timeout กันชนกันตอนเขียนพร้อมกัน
+    - แต่ละ Entry มี stored_at และ ttl ของตัวเอง (None = ไม่หมดอายุเอง ให้ผู้อ่านกำหนด max_age)
+    """
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, import_dir: str = None):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    ttl REAL
+                )
+            """)
+        # Store ใหม่เอี่ยม: ย้ายข้อมูลจากโฟลเดอร์ JSON เดิมเข้ามา (ครั้งเดียว)
+        if import_dir and self.count() == 0:
+            imported = self.import_dir(import_dir)
+            if imported:
+                print(f"💾 Cache store imported {imported} entries from {import_dir}/")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _is_fresh(stored_at, ttl, max_age, now):
+        age = now - stored_at
+        return (ttl is None or age <= ttl) and (max_age is None or age <= max_age)
+
+    # --- 🔎 Read ---
+
+    def get_entry(self, key, max_age=None):
+        """ (stored_at, value) หรือ None ถ้าไม่มี / หมดอายุ """
+        rows = self._query("SELECT value, stored_at, ttl FROM entries WHERE key = ?", (key,))
+        if not rows: return None
+        value, stored_at, ttl = rows[0]
+        if not self._is_fresh(stored_at, ttl, max_age, time.time()): return None
+        return stored_at, json.loads(value)
+
+    def get(self, key, max_age=None):
+        entry = self.get_entry(key, max_age)
+        return entry[1] if entry is not None else None
+
+    def items(self, prefix="", max_age=None):
+        """ [(key, value)] ของทุก key ที่ขึ้นต้นด้วย prefix และยังไม่หมดอายุ """
+        rows = self._query(
+            "SELECT key, value, stored_at, ttl FROM entries WHERE substr(key, 1, ?) = ? ORDER BY key",
+            (len(prefix), prefix),
+        )
+        now = time.time()
+        return [
+            (key, json.loads(value)) for key, value, stored_at, ttl in rows
+            if self._is_fresh(stored_at, ttl, max_age, now)
+        ]
+
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM entries")[0][0]
+
+    # --- ✍️ Write ---
+
+    def set(self, key, value, ttl=None, stored_at=None):
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at, ttl) VALUES (?, ?, ?, ?)",
+                (key, raw, stored_at or time.time(), ttl),
+            )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        """ ลบ Entry ที่เกิน ttl ของตัวเองแล้ว """
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "DELETE FROM entries WHERE ttl IS NOT NULL AND stored_at + ttl < ?", (time.time(),)
+            )
+            return cur.rowcount
+
+    # --- 📦 Import / Export (โฟลเดอร์ JSON: <key>.json, เวลาแก้ไขไฟล์ = stored_at) ---
+
+    def import_dir(self, directory):
+        if not os.path.isdir(directory): return 0
+        imported = 0
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"): continue
+            filepath = os.path.join(directory, filename)
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipped {filename}: {e}")
+                continue
+            self.set(filename[:-len(".json")], value, stored_at=os.path.getmtime(filepath))
+            imported += 1
+        return imported
+
+    def export_dir(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        rows = self._query("SELECT key, value, stored_at FROM entries ORDER BY key")
+        for key, value, stored_at in rows:
+            filepath = os.path.join(directory, f"{key}.json")
+            # เขียนไฟล์ชั่วคราวแล้ว rename (Atomic) + คง stored_at เป็นเวลาแก้ไขไฟล์
+            tmp_path = filepath + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, filepath)
+            os.utime(filepath, (stored_at, stored_at))
+        return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import / export the cache store as a JSON directory")
+    parser.add_argument("command", choices=["import", "export", "purge"])
+    parser.add_argument("directory", nargs="?", default="data_cache")
+    parser.add_argument("--store", default=DEFAULT_CACHE_PATH, help="Cache store sqlite file")
+    args = parser.parse_args(argv)
+
+    store = CacheStore(args.store)
+    try:
+        if args.command == "import":
+            print(f"✅ Imported {store.import_dir(args.directory)} entries")
+        elif args.command == "export":
+            print(f"✅ Exported {store.export_dir(args.directory)} entries to {args.directory}/")
+        else:
+            print(f"✅ Purged {store.purge_expired()} expired entries")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import threading
+
+from app.services.football_data import FootballDataService
+from app.services.ai_engine import AIEngine
+from app.services.prediction_cache import PredictionCache
+from app.services.refresher import BackgroundRefresher
+from app.services.live_feed import LiveHub
+from app.services.backtest import BacktestService
+from app.services.ratings import RatingEngine
+from app.services.auth_cache import AuthCache
+from app.services.password_hasher import PasswordHasher
+from app.services.rate_limit import RateLimiter
+
+
+class ServiceContainer:
+    """
+    รวม Service ที่ใช้ร่วมกันทั้ง Process (สร้างครั้งเดียวใน FastAPI lifespan)
+    Router ดึงไปใช้ผ่าน Depends ใน app/dependencies.py
+    """
+    def __init__(self):
+        self.football_service = FootballDataService()
+        self.ai_engine = AIEngine()
+
+        # 📐 Rating: ค่าเฉลี่ยรายลีก + Rating Model อัปเดตทีละผลการแข่งขันที่ดึงมา
+        self.ratings = RatingEngine(cache=self.football_service.cache)
+        self.ai_engine.ratings = self.ratings
+        self.football_service.result_listeners.append(self.ratings.observe_fixtures)
+
+        self.prediction_cache = PredictionCache(self.ai_engine)
+
+        # warm ด้วย Odds / Injuries / Lineups ที่มีในเครื่อง -> key ตรงกับหน้า Analyze
+        self.football_service.slate_listeners.append(
+            lambda matches: self.prediction_cache.warm(matches, self.football_service.cached_match_details)
+        )
+
+        # Live Score Push: Poller ของ refresher ป้อนข้อมูลให้ LiveHub ทุกรอบ
+        self.live_hub = LiveHub(self.football_service.live_overlay)
+        self.football_service.live_listeners.append(self.live_hub.publish)
+
+        # ตรวจผลแมตช์ที่จบแล้ว (หน้า History)
+        self.backtest = BacktestService(self.football_service, self.ai_engine)
+
+        # 🔐 Cache ของ Token / User ที่ get_current_user ใช้
+        self.auth_cache = AuthCache()
+        # 🔑 bcrypt ของ Login / Register (Thread Pool แยก ไม่แย่ง Endpoint อื่น)
+        self.password_hasher = PasswordHasher()
+        # 🚦 Token Bucket ต่อ User / IP (Endpoint วิเคราะห์) และต่อ Endpoint ของ api-sports
+        self.rate_limiter = RateLimiter()
+        self.football_service.client.limiter = self.rate_limiter
+
+        self.refresher = BackgroundRefresher(self.football_service, self.ratings)
+        # ปิดได้ด้วย BACKGROUND_REFRESH=0 (เช่นตอนรัน Script / Worker ที่ไม่ต้อง Refresh เอง)
+        self.background_refresh = os.getenv("BACKGROUND_REFRESH", "1") != "0"
+
+    def startup(self):
+        self.auth_cache.watch()
+        # โหลด Stats ทุกลีกใน Background -> uvicorn รับ Connection ได้ทันที
+        threading.Thread(target=self.football_service.load_stats, daemon=True).start()
+        threading.Thread(target=self.ratings.load, args=(self.football_service.archive,), daemon=True).start()
+        if self.background_refresh:
+            self.refresher.start()
+
+    async def shutdown(self):
+        await self.refresher.stop()
+        # Rating ที่ยังไม่ได้บันทึกตั้งแต่รอบล่าสุด
+        await asyncio.to_thread(self.ratings.save_if_dirty)
+        # ปิด Connection Pool ของ api-sports
+        await self.football_service.aclose()
+        self.auth_cache.unwatch()
+        self.password_hasher.shutdown()
+        self.rate_limiter.close()
+
+    def metrics(self):
+        """ ตัวเลขสถานะของ Service สำหรับ /metrics """
+        return {
+            "prediction_cache": self.prediction_cache.stats(),
+            "password_hasher": self.password_hasher.stats(),
+            "rate_limit": self.rate_limiter.stats(),
+            "upstream_quota": self.football_service.quota.stats(),
+            "auth_cache": {"tokens": len(self.auth_cache.tokens), "users": len(self.auth_cache.users)},
+        }
@@ -1,82 +1,186 @@
 import os
-import requests
-import json
+import asyncio
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import pathlib
-import httpx
+import threading
 from typing import List, Optional
+from app.services.match_store import MatchStore, LiveOverlay
+from app.services.api_client import ApiSportsClient
+from app.services.refresher import SingleFlight
+from app.services.archive import FixtureArchive
+from app.services.cache_store import CacheStore
+from app.services.team_table import TeamStrengthTable, DEFAULT_STATS, decode_form
+from app.services.quota import QuotaManager, QuotaScaled
 
 load_dotenv()
 
 class FootballDataService:
+    # ⏳ ระยะเวลา Cache / รอบ Refresh: ค่าที่ตั้งใน __init__ คือค่าพื้นฐาน
+    # ค่าที่อ่านได้จริงถูกยืดตามโควตา api-sports ที่เหลือ (QuotaManager.scale)
+    STATS_CACHE_DURATION = QuotaScaled("standings")
+    MATCHES_CACHE_DURATION = QuotaScaled("slate")
+    LIVE_CACHE_DURATION = QuotaScaled("live")
+    ODDS_CACHE_DURATION = QuotaScaled("odds")
+    DETAILS_CACHE_DURATION = QuotaScaled("details")
+
     def __init__(self):
         self.api_key = os.getenv("RAPIDAPI_KEY") or os.getenv("FOOTBALL_API_KEY")
         self.base_url = "https://v3.football.api-sports.io"
+        # HTTP Client ตัวเดียว (Connection Pool) ใช้ทุก Call ไป api-sports
+        self.client = ApiSportsClient(self.api_key, self.base_url)
+        # 📉 นับ Call / โควตาที่เหลือของ api-sports (Client รายงานทุก Response)
+        self.quota = QuotaManager()
+        self.client.quota = self.quota
         
         # สร้างโฟลเดอร์สำหรับเก็บ Cache ถ้ายังไม่มี
         self.cache_dir = "data_cache"
         pathlib.Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        # Cache Store ไฟล์เดียว (SQLite WAL) ใช้ร่วมกันทุก Worker / ไฟล์ JSON เดิมถูก Import ตอนสร้างครั้งแรก
+        self.cache = CacheStore(import_dir=self.cache_dir)
 
         # ระยะเวลา Cache (วินาที)
         self.STATS_CACHE_DURATION = 86400  # 24 ชั่วโมง (สำหรับค่าพลังทีม)
         self.MATCHES_CACHE_DURATION = 900  # 15 นาที (ลดลงเพื่อให้ Base data สดใหม่ขึ้น)
         self.LIVE_CACHE_DURATION = 15      # 🔥 15 วินาที (สำหรับข้อมูล Live Score)
 
-        # โหลด team_stats จาก Cache ทั้งหมดเข้า Memory เพื่อความเร็ว
+        self.ODDS_CACHE_DURATION = 300     # 5 นาที (ราคา Odds)
+        self.ODDS_PREFETCH_WINDOW = 6 * 3600  # Background ดึง Odds ล่วงหน้าเฉพาะคู่ที่จะเตะใน 6 ชม.
+
+        # จำนวนลีกที่ดึงตารางคะแนนพร้อมกันตอน Rebuild Slate
+        self.STATS_FETCH_CONCURRENCY = 8
+
+        # กันยิง Upstream ซ้ำซ้อน: 1 key (slate / live / stats:<league> / odds:<fixture>) รันได้ทีละงาน
+        self.flights = SingleFlight()
+
+        # 🗄️ Archive ในเครื่อง: ทุกอย่างที่ดึงมาถูกเก็บไว้ และทุก Lookup อ่านจาก Archive ก่อน
+        self.archive = FixtureArchive()
+        # Injuries / Lineups ใน Archive ใช้ซ้ำได้กี่วินาที (ก่อนจบเกม) / แมตช์ที่จบแล้วใช้ได้ตลอด
+        self.DETAILS_CACHE_DURATION = 600
+
+        # ค่าพลังทีม: ตาราง NumPy (key = league id + team id) เปิดแบบ mmap ใช้ร่วมกันทุก Worker
+        self.team_table = TeamStrengthTable()
+        # team_stats (ชื่อทีม -> stats) เหลือไว้เป็น Fallback ของ Cache เก่าที่ยังไม่มี team id
+        # โหลดแบบ Lazy: ไม่โหลดใน Constructor เพื่อให้ Server รับ Connection ได้ทันที
+        # (lifespan สั่ง load_stats ใน Background / หรือโหลดเองตอนต้องใช้ครั้งแรก)
         self.team_stats = {}
-        self._load_all_stats_from_disk()
+        self._stats_loaded = False
+        self._stats_lock = threading.Lock()
+
+        # Callback ที่จะถูกเรียกทุกครั้งที่ Slate ถูก Rebuild ใหม่ (เช่น warm prediction cache)
+        self.slate_listeners = []
+
+        # Slate ที่อยู่ใน Memory (Index ตาม id / league / date / status) ไม่ต้องอ่านไฟล์ทุก Request
+        self.match_store = MatchStore()
+        # Live Score ล่าสุดใน Memory: (เวลาที่ดึง, data)
+        self._live_cache = (0.0, [])
+        # ตาราง Live State แบบย่อ ใช้ทับ Slate ตอนอ่าน (ไม่แก้ dict ใน Match Store)
+        self.live_overlay = LiveOverlay()
+        # Callback ที่จะถูกเรียกทุกครั้งที่ Live State เปลี่ยน (ส่ง list ของ Delta)
+        self.live_listeners = []
+        # Callback ที่รับ Fixture ดิบทุกชุดที่ดึงมา (เช่น อัปเดต Rating จากนัดที่จบแล้ว)
+        self.result_listeners = []
 
     # --- 💾 Cache System Helper Methods ---
 
-    def _get_cache_path(self, filename):
-        return os.path.join(self.cache_dir, filename)
+    @staticmethod
+    def _cache_key(filename):
+        """ ชื่อไฟล์เดิม -> key ใน Cache Store (stats_league_39.json -> stats_league_39) """
+        return filename[:-len(".json")] if filename.endswith(".json") else filename
 
-    def _load_json_cache(self, filename, duration):
-        """ อ่านไฟล์ Cache ถ้าไม่หมดอายุ """
-        filepath = self._get_cache_path(filename)
-        if not os.path.exists(filepath):
-            return None
-        
+    def _load_cache_entry(self, filename, duration):
+        """ (เวลาที่บันทึก, data) ถ้าไม่หมดอายุ """
         try:
-            # เช็คเวลาแก้ไขไฟล์
-            file_mod_time = os.path.getmtime(filepath)
-            if time.time() - file_mod_time > duration:
-                return None # หมดอายุ
-            
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
+            return self.cache.get_entry(self._cache_key(filename), max_age=duration)
+        except Exception as e:
+            print(f"⚠️ Failed to read cache {filename}: {e}")
             return None
 
-    def _save_json_cache(self, filename, data):
-        """ บันทึกข้อมูลลงไฟล์ """
+    def _load_json_cache(self, filename, duration):
+        """ อ่าน Cache ถ้าไม่หมดอายุ """
+        entry = self._load_cache_entry(filename, duration)
+        return entry[1] if entry is not None else None
+
+    def _save_json_cache(self, filename, data, ttl=None):
+        """ บันทึกข้อมูล (Atomic: ผู้อ่านไม่มีทางเห็นข้อมูลที่เขียนไม่ครบ) """
         try:
-            filepath = self._get_cache_path(filename)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False)
+            self.cache.set(self._cache_key(filename), data, ttl=ttl)
         except Exception as e:
             print(f"⚠️ Failed to save cache {filename}: {e}")
 
     def _load_all_stats_from_disk(self):
-        """ โหลด Stats ของทุกลีกที่เคยบันทึกไว้เข้าตัวแปร self.team_stats """
-        if not os.path.exists(self.cache_dir): return
-        
-        for filename in os.listdir(self.cache_dir):
-            if filename.startswith("stats_league_"):
-                # ใช้กฎ 24 ชม. แต่โหลดเข้ามาก่อนค่อยว่ากัน
-                data = self._load_json_cache(filename, self.STATS_CACHE_DURATION * 2) 
-                if data:
-                    self.team_stats.update(data)
+        """ โหลด Stats ของทุกลีกที่เคยบันทึกไว้ (Team Table / team_stats สำหรับ Cache แบบเก่า) """
+        self.team_table.refresh()
+        # ใช้กฎ 24 ชม. แต่โหลดเข้ามาก่อนค่อยว่ากัน
+        for key, data in self.cache.items("stats_league_", max_age=self.STATS_CACHE_DURATION * 2):
+            if data:
+                self._apply_league_stats(int(key.rsplit("_", 1)[1]), data)
+
+    @staticmethod
+    def _league_rows(stats):
+        return [(t["team_id"], t["attack"], t["defense"], t["form"]) for t in stats]
+
+    def _apply_league_stats(self, league_id, data):
+        """ Cache แบบใหม่ (list มี team_id) -> Team Table / แบบเก่า (dict ชื่อทีม -> stats) -> team_stats """
+        if isinstance(data, dict):
+            self.team_stats.update(data)
+        elif not self.team_table.has_league(league_id):
+            self.team_table.update_league(league_id, self._league_rows(data))
+
+    def load_stats(self):
+        """ โหลด team_stats จาก Cache ทั้งหมดเข้า Memory (ครั้งเดียว, Thread-safe) """
+        if self._stats_loaded: return
+        with self._stats_lock:
+            if self._stats_loaded: return
+            self._load_all_stats_from_disk()
+            self._stats_loaded = True
+            print(f"✅ Team stats loaded: {len(self.team_table)} teams (+{len(self.team_stats)} by name)")
+
+    def _team_stats_for(self, items):
+        """
+        ค่าพลังทีมเหย้า/เยือนของ Fixture ทั้ง Batch (gather จาก Team Table ครั้งเดียว)
+        คืน list ของ (home_stats, away_stats) / None = ไม่มีข้อมูลของทีมนั้น
+        Fixture ที่ข้อมูลไม่ครบ (ไม่มี teams / league) ได้ (None, None) -> ผู้เรียกข้ามไปทีละแมตช์
+        """
+        team_ids, league_ids, names = [], [], []
+        for item in items:
+            for side in ("home", "away"):
+                try:
+                    team_id, league_id, name = item["teams"][side]["id"], item["league"]["id"], item["teams"][side]["name"]
+                except (KeyError, TypeError):
+                    team_id = league_id = name = None
+                team_ids.append(team_id)
+                league_ids.append(league_id)
+                names.append(name)
+
+        attack, defense, form, found = self.team_table.gather(team_ids, league_ids)
+        stats = [
+            {"attack": round(float(attack[k]), 2), "defense": round(float(defense[k]), 2), "form": decode_form(form[k])}
+            if found[k] else self.team_stats.get(names[k])
+            for k in range(len(team_ids))
+        ]
+        return list(zip(stats[0::2], stats[1::2]))
+
+    async def aclose(self):
+        await self.client.aclose()
 
     # --- 📊 Logic การดึงข้อมูล ---
 
-    def _fetch_team_stats_from_api(self, league_id, season):
+    async def _fetch_team_stats_from_api(self, league_id, season):
+        """ ดึงตารางคะแนนของลีก (ลีกเดียวกันที่ถูกขอพร้อมกันจะยิงจริงแค่ครั้งเดียว) """
+        await self.flights.run(
+            f"stats:{league_id}",
+            lambda: self._fetch_league_standings(league_id, season)
+        )
+
+    async def _fetch_league_standings(self, league_id, season):
         """ 
         ดึงตารางคะแนน (Standings) -> เก็บลงไฟล์ Cache แยกรายลีก 
         อายุ Cache: 24 ชั่วโมง
         """
+        if not self._stats_loaded:
+            await asyncio.to_thread(self.load_stats)
         if not self.api_key: return
 
         # 1. เช็ค Cache ก่อนยิง API
@@ -84,18 +188,17 @@ class FootballDataService:
         cached_data = self._load_json_cache(cache_filename, self.STATS_CACHE_DURATION)
         
         if cached_data:
-            self.team_stats.update(cached_data)
+            # อาจเป็น Worker อื่นเพิ่งดึงลีกนี้: โหลด Team Table ที่เขาเขียนไว้ก่อน
+            self.team_table.refresh()
+            self._apply_league_stats(league_id, cached_data)
             return
 
         # 2. ถ้ายิง API (กรณีไม่มี Cache หรือหมดอายุ)
         print(f"🔄 Fetching API: League Standings {league_id}...")
-        url = f"{self.base_url}/standings"
         params = {"league": str(league_id), "season": str(season)}
-        headers = {"x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io"}
 
         try:
-            response = requests.get(url, headers=headers, params=params)
-            data = response.json()
+            data = await self.client.get("/standings", params=params)
 
             if "response" not in data or not data["response"]: return
 
@@ -110,175 +213,282 @@ class FootballDataService:
             if total_matches == 0: return
             avg_goals = total_goals / total_matches
 
-            new_stats = {}
+            new_stats = []
             for t in standings:
-                name = t["team"]["name"]
                 played = t["all"]["played"]
                 if played == 0: continue
                 
                 att = (t["all"]["goals"]["for"] / played) / avg_goals
                 defi = (t["all"]["goals"]["against"] / played) / avg_goals
-                form = t.get("form", "-----")
+                form = t.get("form") or "-----"
 
-                new_stats[name] = {
+                new_stats.append({
+                    "team_id": t["team"]["id"],
+                    "name": t["team"]["name"],
                     "attack": round(att, 2), 
                     "defense": round(defi, 2),
                     "form": form
-                }
+                })
             
-            # 3. บันทึกลงไฟล์ และ อัปเดต Memory
-            self._save_json_cache(cache_filename, new_stats)
-            self.team_stats.update(new_stats)
+            # 3. บันทึกลง Cache และ อัปเดต Team Table (key ด้วย team id -> ชื่อซ้ำต่างลีกไม่ทับกัน)
+            self._save_json_cache(cache_filename, new_stats, ttl=self.STATS_CACHE_DURATION * 2)
+            self.team_table.update_league(league_id, self._league_rows(new_stats))
             print(f"✅ Cached stats for League {league_id}")
 
         except Exception as e:
             print(f"❌ Stats Error (League {league_id}): {e}")
 
-    def _get_live_matches_data(self):
+    async def _get_live_matches_data(self):
         """
         🔥 ดึงข้อมูลเฉพาะคู่ที่กำลังแข่ง (Live) 
         Cache สั้นมาก (15 วินาที) เพื่อความ Real-time
+        หมดอายุแล้ว -> คืนข้อมูลเดิมทันที แล้ว Refresh ใน Background (Stale-while-revalidate)
         """
+        fetched_at, live_data = self._live_cache
+        if time.time() - fetched_at < self.LIVE_CACHE_DURATION:
+            return live_data
+
+        if fetched_at > 0:
+            self.flights.spawn("live", self._refresh_live_data)
+            return live_data
+        return await self.flights.run("live", self._refresh_live_data)
+
+    async def _refresh_live_data(self):
+        """ โหลด Live Score: ไฟล์ Cache (Worker อื่นเพิ่งดึง) -> ยิง API """
+        _, live_data = self._live_cache
         cache_filename = "matches_live.json"
-        cached_data = self._load_json_cache(cache_filename, self.LIVE_CACHE_DURATION)
+        cached = self._load_cache_entry(cache_filename, self.LIVE_CACHE_DURATION)
         
-        if cached_data is not None:
-            return cached_data
+        if cached is not None:
+            self._live_cache = cached
+            self._update_live_overlay(cached[1])
+            return cached[1]
 
         if not self.api_key: return []
 
         try:
             # ยิง Endpoint พิเศษสำหรับ Live โดยเฉพาะ (กิน Resource น้อยกว่า)
-            url = f"{self.base_url}/fixtures"
             params = {"live": "all"}
-            headers = {"x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io"}
             
-            res = requests.get(url, headers=headers, params=params, timeout=10)
-            data = res.json().get("response", [])
+            res = await self.client.get("/fixtures", params=params, timeout=10)
+            data = res.get("response", [])
             
             # บันทึก Cache Live
-            self._save_json_cache(cache_filename, data)
+            self._save_json_cache(cache_filename, data, ttl=self.STATS_CACHE_DURATION)
+            self._live_cache = (time.time(), data)
+            self._update_live_overlay(data)
             return data
         except Exception as e:
             print(f"⚠️ Error fetching live matches: {e}")
-            return []
+            # ใช้ข้อมูลเดิมไปก่อนจนครบรอบ Cache (ไม่ยิงซ้ำทุก Request ตอน Upstream ล่ม)
+            self._live_cache = (time.time(), live_data)
+            return live_data
 
-    def get_upcoming_matches(self):
+    def _update_live_overlay(self, live_data):
+        deltas = self.live_overlay.apply(live_data)
+        if deltas:
+            self._notify_listeners(self.live_listeners, deltas)
+
+    async def _refresh_slate(self):
         """
-        🔥 ดึงแมตช์ (Cache 15 นาที) 
-        🔥 Merge ข้อมูล Live Score (Cache 15 วินาที)
+        โหลด Base Matches เข้า Match Store (Atomic Swap)
+        ลำดับ: ไฟล์ Cache (ถ้ายังไม่หมดอายุ) -> ยิง API Rebuild ใหม่
         """
-        # 1. พยายามโหลด Base Matches จาก Cache ก่อน
         cache_filename = "matches_upcoming.json"
-        all_matches = self._load_json_cache(cache_filename, self.MATCHES_CACHE_DURATION)
+        cached = self._load_cache_entry(cache_filename, self.MATCHES_CACHE_DURATION)
         
-        # ถ้าไม่มี Cache ค่อยยิง API Base Data
-        if all_matches is None:
-            if not self.api_key: return []
-            
-            all_matches = []
-            dates_to_fetch = [
-                datetime.now().strftime("%Y-%m-%d"),
-                (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-            ]
-            current_year = datetime.now().year
-            season = current_year if datetime.now().month >= 7 else current_year - 1
+        if cached is not None:
+            # ใช้เวลาที่บันทึกเป็นเวลาโหลด เพื่อให้หมดอายุตามรอบ 15 นาทีเดิม
+            loaded_at, all_matches = cached
+        else:
+            all_matches = await self._rebuild_slate_from_api()
+            if all_matches is None: return self.match_store.snapshot
+            self._save_json_cache(cache_filename, all_matches, ttl=self.STATS_CACHE_DURATION)
+            print(f"✅ Total matches loaded & Cached: {len(all_matches)}")
+            loaded_at = time.time()
+
+        snapshot = self.match_store.replace(all_matches, loaded_at=loaded_at)
+        # Listener ของ Slate (warm Prediction Cache) ใช้ CPU ทั้ง Slate -> รันใน Thread ไม่บล็อก Event Loop
+        await asyncio.to_thread(self._notify_listeners, self.slate_listeners, all_matches)
+        return snapshot
+
+    async def _get_slate(self):
+        """
+        Slate สำหรับผู้อ่าน: ยังสด -> ใช้เลย / หมดอายุแต่มีของเดิม -> ใช้ของเดิมแล้ว Refresh ใน Background
+        ไม่มีอะไรเลย (เพิ่งเริ่ม Process) -> รอโหลด (ทุก Request รอ Rebuild ตัวเดียวกัน)
+        """
+        if self.match_store.is_fresh(self.MATCHES_CACHE_DURATION):
+            return self.match_store.snapshot
+        if self.match_store.is_loaded:
+            self.flights.spawn("slate", self._refresh_slate)
+            return self.match_store.snapshot
+        return await self.flights.run("slate", self._refresh_slate)
+
+    async def _fetch_fixtures_for_date(self, date_str):
+        """ ดึง Fixtures ดิบของวันเดียว (พังคืน []) """
+        try:
+            data = await self.client.get("/fixtures", params={"date": date_str})
+            fixtures = data.get("response", [])
+            self._archive_fixtures(fixtures)
+            print(f"   found {len(fixtures)} matches on {date_str}")
+            return fixtures
+        except Exception as e:
+            print(f"❌ Error fetching date {date_str}: {e}")
+            return []
+
+    async def _fetch_stats_for_leagues(self, league_ids, season):
+        """ ดึงตารางคะแนนหลายลีกพร้อมกัน (จำกัดจำนวนพร้อมกันที่ STATS_FETCH_CONCURRENCY) """
+        semaphore = asyncio.Semaphore(self.STATS_FETCH_CONCURRENCY)
+
+        async def fetch_one(league_id):
+            async with semaphore:
+                await self._fetch_team_stats_from_api(league_id, season)
+
+        await asyncio.gather(*(fetch_one(lid) for lid in league_ids))
 
-            print(f"📡 Fetching Matches from API: {dates_to_fetch}")
-            headers = {"x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io"}
-            url = f"{self.base_url}/fixtures"
+    async def _rebuild_slate_from_api(self):
+        """ ยิง API ดึงแมตช์วันนี้ + พรุ่งนี้ (คืน None ถ้าไม่มี API Key) """
+        if not self.api_key: return None
+
+        all_matches = []
+        dates_to_fetch = [
+            datetime.now().strftime("%Y-%m-%d"),
+            (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        ]
+        current_year = datetime.now().year
+        season = current_year if datetime.now().month >= 7 else current_year - 1
+
+        print(f"📡 Fetching Matches from API: {dates_to_fetch}")
 
-            for date_str in dates_to_fetch:
-                params = {"date": date_str} 
+        # 1. ดึง Fixtures ทุกวันพร้อมกัน
+        fixtures_by_date = await asyncio.gather(*(self._fetch_fixtures_for_date(d) for d in dates_to_fetch))
 
+        # 2. Fetch Stats Logic: รวมลีกของทุกวันเป็น Set เดียว (ลีกที่ซ้ำกันข้ามวันดึงครั้งเดียว)
+        leagues_needed = set()
+        for fixtures in fixtures_by_date:
+            for item in fixtures:
                 try:
-                    res = requests.get(url, headers=headers, params=params)
-                    data = res.json()
-                    
-                    if "response" in data:
-                        print(f"   found {len(data['response'])} matches on {date_str}")
-                        
-                        # Fetch Stats Logic
-                        leagues_needed = set()
-                        for item in data["response"]:
-                            leagues_needed.add(item["league"]["id"])
-                        
-                        for lid in leagues_needed:
-                            self._fetch_team_stats_from_api(lid, season)
-
-                        # Create Match Objects
-                        for item in data["response"]:
-                            home = item["teams"]["home"]["name"]
-                            away = item["teams"]["away"]["name"]
-                            
-                            # Skip if no stats (optional)
-                            if home not in self.team_stats or away not in self.team_stats: continue
-                            
-                            all_matches.append({
-                                "id": item["fixture"]["id"],
-                                "home_team": home,
-                                "away_team": away,
-                                "home_id": item["teams"]["home"]["id"],
-                                "away_id": item["teams"]["away"]["id"],
-                                "home_logo": item["teams"]["home"]["logo"],
-                                "away_logo": item["teams"]["away"]["logo"],
-                                "league": item["league"]["name"],
-                                "league_logo": item["league"]["logo"],
-                                "kickoff_time": item["fixture"]["date"],
-                                "status": item["fixture"]["status"]["short"],
-                                "goals_home": item["goals"]["home"], # เพิ่มฟิลด์สกอร์
-                                "goals_away": item["goals"]["away"], # เพิ่มฟิลด์สกอร์
-                                "home_stats": self.team_stats.get(home, {"attack":1.0, "defense":1.0, "form": "-----"}),
-                                "away_stats": self.team_stats.get(away, {"attack":1.0, "defense":1.0, "form": "-----"})
-                            })
-                except Exception as e:
-                    print(f"❌ Error fetching date {date_str}: {e}")
+                    leagues_needed.add(item["league"]["id"])
+                except (KeyError, TypeError):
                     continue
+        await self._fetch_stats_for_leagues(leagues_needed, season)
 
-            all_matches.sort(key=lambda x: x["kickoff_time"])
-            self._save_json_cache(cache_filename, all_matches)
-            print(f"✅ Total matches loaded & Cached: {len(all_matches)}")
+        # 3. Create Match Objects (ค่าพลังทีมทั้ง Slate gather จาก Team Table ครั้งเดียว)
+        for fixtures in fixtures_by_date:
+            for item, (home_stats, away_stats) in zip(fixtures, self._team_stats_for(fixtures)):
+                try:
+                    home = item["teams"]["home"]["name"]
+                    away = item["teams"]["away"]["name"]
+
+                    # Skip if no stats (optional)
+                    if home_stats is None or away_stats is None: continue
+
+                    all_matches.append({
+                        "id": item["fixture"]["id"],
+                        "home_team": home,
+                        "away_team": away,
+                        "home_id": item["teams"]["home"]["id"],
+                        "away_id": item["teams"]["away"]["id"],
+                        "home_logo": item["teams"]["home"]["logo"],
+                        "away_logo": item["teams"]["away"]["logo"],
+                        "league": item["league"]["name"],
+                        "league_id": item["league"]["id"],
+                        "league_logo": item["league"]["logo"],
+                        "kickoff_time": item["fixture"]["date"],
+                        "status": item["fixture"]["status"]["short"],
+                        "goals_home": item["goals"]["home"], # เพิ่มฟิลด์สกอร์
+                        "goals_away": item["goals"]["away"], # เพิ่มฟิลด์สกอร์
+                        "home_stats": home_stats,
+                        "away_stats": away_stats
+                    })
+                except Exception as e:
+                    print(f"❌ Error parsing fixture: {e}")
+                    continue
 
-        # 2. 🔥 Hybrid Merge: ดึงข้อมูล Live ล่าสุดมาทับข้อมูล Base
-        live_data = self._get_live_matches_data()
-        if live_data:
-            # สร้าง Map เพื่อความเร็วในการค้นหา
-            live_map = {m['fixture']['id']: m for m in live_data}
-            
-            for match in all_matches:
-                m_id = match['id']
-                if m_id in live_map:
-                    live_match = live_map[m_id]
-                    # อัปเดตข้อมูลสด
-                    match['status'] = live_match['fixture']['status']['short']     # เช่น 1H, 2H, 35'
-                    match['elapsed'] = live_match['fixture']['status']['elapsed']  # นาทีที่แข่ง
-                    match['goals_home'] = live_match['goals']['home']              # สกอร์เจ้าบ้าน
-                    match['goals_away'] = live_match['goals']['away']              # สกอร์ทีมเยือน
-        
+        all_matches.sort(key=lambda x: x["kickoff_time"])
         return all_matches
 
-    def get_match_by_id(self, match_id: int):
-        # ลองหาในลิสต์ Upcoming (ที่มี Live Data ผสมแล้ว) ก่อน
-        matches = self.get_upcoming_matches()
-        for m in matches:
-            if m['id'] == match_id: return m
-            
-        if self.api_key:
-            return self._fetch_single_match_direct(match_id)
-        return {}
+    async def get_slate_view(self):
+        """
+        🔥 Slate + Live Score (Live Overlay) แบบ Snapshot ที่สอดคล้องกัน
+        View ถูกสร้างใหม่เฉพาะตอน Slate หรือ Live เปลี่ยน -> Request ปกติไม่ต้อง Copy/Merge ทั้ง List
+        """
+        await self._get_slate()
+        await self._get_live_matches_data()
+        return self.match_store.view(self.live_overlay)
+
+    async def get_upcoming_matches(self):
+        """
+        🔥 ดึงแมตช์ (Match Store ใน Memory, Refresh ทุก 15 นาที) 
+        🔥 Merge ข้อมูล Live Score (Cache 15 วินาที)
+        """
+        view = await self.get_slate_view()
+        return view.matches
+
+    def _archive_fixtures(self, items):
+        """ เก็บ Fixture ลง Archive แล้วส่งต่อให้ result_listeners """
+        if not items: return
+        self.archive.add_fixtures(items)
+        self._notify_listeners(self.result_listeners, items)
+
+    def _notify_listeners(self, listeners, data):
+        for listener in listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                print(f"⚠️ Listener failed: {e}")
+
+    @staticmethod
+    def _h2h_checked_key(team1_id, team2_id):
+        return f"h2h_checked_{min(team1_id, team2_id)}_{max(team1_id, team2_id)}"
+
+    def has_match_locally(self, match_id: int):
+        """ get_match_by_id ตอบได้โดยไม่ยิง Upstream (อยู่ใน Slate หรือจบแล้วใน Archive) """
+        return self.match_store.get(match_id) is not None or self.archive.is_finished(match_id)
+
+    def details_cached(self, match_data):
+        """ get_match_details ตอบได้จากในเครื่องทั้งหมด (Odds / Injuries / Lineups / H2H) ไม่ยิง Upstream """
+        if not self.api_key: return True
+        match_id = match_data["id"]
+        if not self.is_odds_fresh(match_id):
+            if not (self.archive.is_finished(match_id) and self.archive.latest("odds", match_id) is not None):
+                return False
+        if self._archived_details("injuries", match_id) is None: return False
+        if self._archived_details("lineups", match_id) is None: return False
+        if "home_id" in match_data and "away_id" in match_data:
+            home_id, away_id = match_data["home_id"], match_data["away_id"]
+            if len(self.archive.head_to_head(home_id, away_id, limit=5)) < 5 and \
+                    self._load_json_cache(self._h2h_checked_key(home_id, away_id), self.STATS_CACHE_DURATION) is None:
+                return False
+        return True
+
+    async def get_match_by_id(self, match_id: int):
+        # ลองหาใน Match Store (O(1) ผ่าน Index) ที่มี Live Data ผสมแล้ว ก่อน
+        view = await self.get_slate_view()
+        match = view.get(match_id)
+        if match is not None:
+            return match
+        return await self._fetch_single_match_direct(match_id)
     
-    def _fetch_single_match_direct(self, match_id):
-        url = f"{self.base_url}/fixtures"
+    async def _fetch_single_match_direct(self, match_id):
         params = {"id": str(match_id)}
-        headers = {"x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io"}
         try:
-            res = requests.get(url, headers=headers, params=params).json()
-            if "response" in res and res["response"]:
-                item = res["response"][0]
+            item = None
+            # แมตช์ที่จบแล้วใน Archive ไม่เปลี่ยนอีก -> ไม่ต้องยิง Upstream
+            if self.archive.is_finished(match_id):
+                item = self.archive.latest("fixture", match_id)[1]
+            elif self.api_key:
+                res = await self.client.get("/fixtures", params=params)
+                if res.get("response"):
+                    item = res["response"][0]
+                    self._archive_fixtures([item])
+
+            if item is not None:
                 home = item["teams"]["home"]["name"]
                 away = item["teams"]["away"]["name"]
                 
-                self._fetch_team_stats_from_api(item["league"]["id"], item["league"]["season"])
+                await self._fetch_team_stats_from_api(item["league"]["id"], item["league"]["season"])
+                home_stats, away_stats = self._team_stats_for([item])[0]
 
                 return {
                     "id": item["fixture"]["id"],
@@ -287,25 +497,65 @@ class FootballDataService:
                     "home_id": item["teams"]["home"]["id"],
                     "away_id": item["teams"]["away"]["id"],
                     "league": item["league"]["name"],
+                    "league_id": item["league"]["id"],
                     "kickoff_time": item["fixture"]["date"],
                     "status": item["fixture"]["status"]["short"],
                     "goals_home": item["goals"]["home"],
                     "goals_away": item["goals"]["away"],
-                    "home_stats": self.team_stats.get(home, {"attack":1.0, "defense":1.0, "form": "-----"}),
-                    "away_stats": self.team_stats.get(away, {"attack":1.0, "defense":1.0, "form": "-----"})
+                    "home_stats": home_stats or DEFAULT_STATS,
+                    "away_stats": away_stats or DEFAULT_STATS
                 }
         except: pass
         return {}
 
-    def get_head_to_head(self, team1_id: int, team2_id: int):
-        if not self.api_key: return []
-        url = f"{self.base_url}/fixtures/headtohead"
-        params = {"h2h": f"{team1_id}-{team2_id}", "last": "5"}
-        headers = {"x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io"}
+    async def get_match_details(self, match_data, deadline: float = 6.0):
+        """
+        🔥 ยิง Odds / Injuries / Lineups / H2H พร้อมกัน ภายในเวลา deadline (วินาที)
+        ตัวไหนไม่ทันหรือพัง -> ใช้ค่า Default (odds=None จะทำให้ AI ใช้ Handicap จาก Stats แทน)
+        คืนค่า (details, missing) โดย missing คือชื่อข้อมูลที่ไม่ได้มา
+        """
+        match_id = match_data["id"]
+        self.quota.note_interest(match_id)
+        defaults = {"odds": None, "injuries": [], "lineups": [], "h2h": []}
+        coros = {
+            "odds": self.get_match_odds(match_id),
+            "injuries": self.get_match_injuries(match_id),
+            "lineups": self.get_match_lineups(match_id),
+        }
+        if "home_id" in match_data and "away_id" in match_data:
+            coros["h2h"] = self.get_head_to_head(match_data["home_id"], match_data["away_id"])
+
+        tasks = {name: asyncio.create_task(coro) for name, coro in coros.items()}
+        done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        for task in pending:
+            task.cancel()
+
+        details, missing = dict(defaults), []
+        for name, task in tasks.items():
+            if task in done and task.exception() is None:
+                details[name] = task.result()
+            else:
+                missing.append(name)
+        if missing:
+            print(f"⏱️ Match {match_id}: partial data, missing {missing}")
+        return details, missing
+
+    async def get_head_to_head(self, team1_id: int, team2_id: int):
+        # Archive มีครบ 5 นัดล่าสุดแล้ว -> ไม่ต้องยิง Upstream
+        # ไม่ครบ (ทีมเพิ่งเจอกันไม่กี่ครั้ง): ถาม Upstream ได้ไม่เกินวันละครั้งต่อคู่ (จำไว้แม้ได้ผลน้อย / ว่าง)
+        items = self.archive.head_to_head(team1_id, team2_id, limit=5)
+        checked_key = self._h2h_checked_key(team1_id, team2_id)
+        if len(items) < 5 and self.api_key and self._load_json_cache(checked_key, self.STATS_CACHE_DURATION) is None:
+            params = {"h2h": f"{team1_id}-{team2_id}", "last": "5"}
+            try:
+                res = await self.client.get("/fixtures/headtohead", params=params)
+                items = res.get("response", [])
+                self._archive_fixtures(items)
+                self._save_json_cache(checked_key, len(items), ttl=self.STATS_CACHE_DURATION)
+            except: pass
         try:
-            res = requests.get(url, headers=headers, params=params).json()
             history = []
-            for item in res.get("response", []):
+            for item in items:
                  history.append({
                     "date": item["fixture"]["date"].split("T")[0],
                     "home_team": item["teams"]["home"]["name"],
@@ -317,14 +567,45 @@ class FootballDataService:
             return history
         except: return []
 
-    def get_match_odds(self, match_id: int):
-        # ⚠️ Real-time Part: ส่วนนี้เราตั้งใจให้ดึงสดเสมอ
+    def _fresh_odds(self, match_id: int):
+        """
+        (เวลาที่ดึง, odds) ที่ยังสดจาก Cache Store (ใช้ร่วมกันทุก Worker) / None ถ้าไม่มีหรือเก่ากว่า ODDS_CACHE_DURATION
+        odds เป็น None ได้ (แมตช์ที่ไม่มีราคา) ก็ถือว่าสดเหมือนกัน
+        """
+        return self._load_cache_entry(f"odds_{match_id}", self.ODDS_CACHE_DURATION)
+
+    def is_odds_fresh(self, match_id: int):
+        return self._fresh_odds(match_id) is not None
+
+    def prune_odds_cache(self):
+        """ ลบ Entry ที่หมดอายุใน Cache Store (Odds เก็บไว้ 1 วัน) """
+        self.cache.purge_expired()
+
+    async def get_match_odds(self, match_id: int):
+        # ⚠️ Real-time Part: Cache สั้น (ODDS_CACHE_DURATION) และ Background ดึงล่วงหน้าให้คู่ที่มีคนดู
+        cached = self._fresh_odds(match_id)
+        if cached is not None:
+            return cached[1]
+        return await self.flights.run(f"odds:{match_id}", lambda: self._fetch_match_odds(match_id))
+
+    async def _fetch_match_odds(self, match_id: int):
+        # Worker อื่นอาจเพิ่งดึงไว้ระหว่างรอ -> เช็ค Cache Store อีกครั้งก่อนยิง
+        cached = self._fresh_odds(match_id)
+        if cached is not None:
+            return cached[1]
+        odds = await self._request_match_odds(match_id)
+        self._save_json_cache(f"odds_{match_id}", odds, ttl=86400)
+        return odds
+
+    async def _request_match_odds(self, match_id: int):
+        # แมตช์จบแล้ว: ใช้ Odds Snapshot สุดท้ายใน Archive (ราคาปิด)
+        if self.archive.is_finished(match_id):
+            archived = self.archive.latest("odds", match_id)
+            if archived is not None: return archived[1]
         if not self.api_key: return None
-        url = f"{self.base_url}/odds"
         params = {"fixture": str(match_id), "bookmaker": "1"} 
-        headers = {"x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io"}
         try:
-            res = requests.get(url, headers=headers, params=params).json()
+            res = await self.client.get("/odds", params=params)
             if not res.get("response"): return None
 
             bets = res["response"][0]["bookmakers"][0]["bets"]
@@ -361,66 +642,104 @@ class FootballDataService:
                                     best_hdp = {"line": float(line), "odd": odd}
                              except: pass
                     if best_hdp: odds_data["handicap"] = best_hdp
+            self.archive.add("odds", match_id, odds_data)
             return odds_data
         except: return None
 
-    def get_match_lineups(self, match_id: int):
+    def cached_match_details(self, match_id: int):
+        """
+        (odds, injuries, lineups) จากข้อมูลในเครื่องเท่านั้น (ไม่ยิง Upstream)
+        ค่าเดียวกับที่ get_match_details จะได้ถ้าตอบจาก Cache -> ใช้ warm Prediction Cache ให้ key ตรงกับหน้า Analyze
+        """
+        cached = self._fresh_odds(match_id)
+        odds = cached[1] if cached is not None else None
+        injuries = self._archived_details("injuries", match_id)
+        lineups = self._archived_details("lineups", match_id)
+        return odds, injuries or [], lineups or []
+
+    def _archived_details(self, kind, match_id):
+        """
+        Lineups / Injuries จาก Archive (ยังสด หรือแมตช์จบแล้ว)
+        ผลว่าง (ยังไม่ประกาศ) ก็นับเป็นค่าที่สด -> ไม่ยิงซ้ำทุก Request ภายใน DETAILS_CACHE_DURATION
+        (แมตช์จบแล้วแต่ผลว่าง: ใช้อายุเท่ากัน ไม่ล็อกค่าว่างไว้ตลอดไป)
+        """
+        archived = self.archive.latest(kind, match_id)
+        if archived is None: return None
+        fetched_at, payload = archived
+        if payload and self.archive.is_finished(match_id): return payload
+        return payload if time.time() - fetched_at < self.DETAILS_CACHE_DURATION else None
+
+    async def get_match_lineups(self, match_id: int):
+        archived = self._archived_details("lineups", match_id)
+        if archived is not None: return archived
         if not self.api_key: return []
-        url = f"{self.base_url}/fixtures/lineups"
         params = {"fixture": str(match_id)}
-        headers = {"x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io"}
         try:
-            res = requests.get(url, headers=headers, params=params).json()
-            return res.get("response", [])
+            res = await self.client.get("/fixtures/lineups", params=params)
+            lineups = res.get("response", [])
+            self.archive.add("lineups", match_id, lineups)
+            return lineups
         except: return []
 
-    def get_match_injuries(self, match_id: int):
+    async def get_match_injuries(self, match_id: int):
+        archived = self._archived_details("injuries", match_id)
+        if archived is not None: return archived
         if not self.api_key: return []
-        url = f"{self.base_url}/injuries"
         params = {"fixture": str(match_id)}
-        headers = {"x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io"}
         try:
-            res = requests.get(url, headers=headers, params=params).json()
-            return res.get("response", [])
+            res = await self.client.get("/injuries", params=params)
+            injuries = res.get("response", [])
+            self.archive.add("injuries", match_id, injuries)
+            return injuries
         except: return []   
 
-    def get_history_matches(self, date_str: str):
+    async def get_history_matches(self, date_str: str):
+        # วันที่เก็บครบแล้วใน Archive -> Replay จากในเครื่อง (ไม่ใช้ Quota)
+        if self.archive.has_history_day(date_str):
+            return [m for _, m in self.archive.history(date_str, date_str)]
         if not self.api_key: return []
         
-        url = f"{self.base_url}/fixtures"
         params = { "date": date_str, "status": "FT" }
-        headers = { "x-rapidapi-key": self.api_key, "x-rapidapi-host": "v3.football.api-sports.io" }
         
         try:
-            res = requests.get(url, headers=headers, params=params).json()
+            res = await self.client.get("/fixtures", params=params)
             response_data = res.get("response", [])
+            self._archive_fixtures(response_data)
             
+            # ใช้ _fetch_team_stats_from_api ที่มี Cache รองรับ (ลีกละครั้ง)
+            leagues = {item["league"]["id"]: item["league"]["season"] for item in response_data}
+            for league_id, season in leagues.items():
+                await self._fetch_team_stats_from_api(league_id, season)
+
             matches = []
-            for item in response_data:
+            for item, (home_stats, away_stats) in zip(response_data, self._team_stats_for(response_data)):
                 league_id = item["league"]["id"]
-                season = item["league"]["season"]
-
-                # ใช้ _fetch_team_stats_from_api ที่มี Cache ไฟล์รองรับ
-                self._fetch_team_stats_from_api(league_id, season)
-
                 home = item["teams"]["home"]["name"]
                 away = item["teams"]["away"]["name"]
                 
-                if home not in self.team_stats or away not in self.team_stats: continue
+                if home_stats is None or away_stats is None: continue
 
                 matches.append({
                     "id": item["fixture"]["id"],
                     "home_team": home,
                     "away_team": away,
+                    "home_id": item["teams"]["home"]["id"],
+                    "away_id": item["teams"]["away"]["id"],
                     "home_logo": item["teams"]["home"]["logo"],
                     "away_logo": item["teams"]["away"]["logo"],
                     "league": item["league"]["name"],
+                    "league_id": league_id,
+                    "kickoff_time": item["fixture"]["date"],
                     "score_home": item["goals"]["home"],
                     "score_away": item["goals"]["away"],
                     "score": f"{item['goals']['home']} - {item['goals']['away']}",
-                    "home_stats": self.team_stats.get(home, {"attack":1.0, "defense":1.0, "form": "-----"}),
-                    "away_stats": self.team_stats.get(away, {"attack":1.0, "defense":1.0, "form": "-----"})
+                    "home_stats": home_stats,
+                    "away_stats": away_stats
                 })
+            # เก็บ Snapshot ที่พร้อมวิเคราะห์ไว้ Replay (วันที่ผ่านไปแล้วเท่านั้นที่ถือว่าครบทั้งวัน)
+            self.archive.add_history(
+                date_str, matches, complete=date_str < datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            )
             return matches
         except Exception as e:
             print(f"Error fetching history: {e}")
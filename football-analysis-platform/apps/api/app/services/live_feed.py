@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+
+class LiveHub:
+    """
+    📡 กระจาย Live Score ให้ทุก Client ที่เปิด Stream ค้างไว้
+    Poller ฝั่ง Server (BackgroundRefresher) ยิง Upstream รอบเดียว -> LiveOverlay คำนวณ Delta
+    -> LiveHub ส่งเฉพาะคู่ที่เปลี่ยนไปยัง Queue ของแต่ละ Client
+    """
+    def __init__(self, overlay, queue_size: int = 100):
+        self.overlay = overlay
+        self.queue_size = queue_size
+        self._subscribers = set()
+
+    def publish(self, deltas):
+        """ ส่ง Delta ให้ทุก Subscriber """
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(deltas)
+            except asyncio.QueueFull:
+                # Client อ่านไม่ทัน: ทิ้ง Delta ที่ค้าง แล้วสั่งให้ส่ง Snapshot ใหม่ทั้งชุด (None = resync)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def snapshot(self):
+        return self.overlay.live_items()
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    async def stream(self, request, heartbeat: float = 15.0):
+        """ Generator สำหรับ Server-Sent Events: snapshot ครั้งแรก แล้วตามด้วย delta """
+        queue = self.subscribe()
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(self.snapshot())}\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    deltas = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if deltas is None:
+                    yield f"event: snapshot\ndata: {json.dumps(self.snapshot())}\n\n"
+                else:
+                    yield f"event: delta\ndata: {json.dumps(deltas)}\n\n"
+        finally:
+            self.unsubscribe(queue)
@@ -0,0 +1,312 @@
+import base64
+import bisect
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+try:
+    import brotli  # Optional: ถ้าติดตั้งไว้จะเสิร์ฟ br ให้ Client ที่รองรับ
+except ImportError:
+    brotli = None
+
+
+# กลุ่มสถานะสำหรับกรองหน้า List (รหัสสถานะของ api-sports)
+STATUS_GROUPS = {
+    "live": {"1H", "HT", "2H", "ET", "BT", "P", "SUSP", "INT", "LIVE"},
+    "upcoming": {"NS", "TBD"},
+    "finished": {"FT", "AET", "PEN"},
+}
+
+def status_group(status):
+    for group, codes in STATUS_GROUPS.items():
+        if status in codes: return group
+    return "other"  # PST / CANC / ABD / AWD / WO
+
+def sort_key(match):
+    """ ลำดับของ Slate และ Cursor: (kickoff, id) """
+    return (match.get("kickoff_time") or "", match["id"])
+
+def encode_cursor(match):
+    kickoff, match_id = sort_key(match)
+    return base64.urlsafe_b64encode(f"{kickoff}|{match_id}".encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    kickoff, match_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+    return (kickoff, int(match_id))
+
+
+class MatchSnapshot:
+    """
+    Slate หนึ่งชุดพร้อม Index (สร้างครั้งเดียว แล้วไม่แก้ไขโครงสร้างอีก)
+    - by_id: fixture id -> match
+    - by_league / by_date / by_status: key -> list ของ match (เรียงตาม (kickoff, id) เหมือน list หลัก)
+    """
+    def __init__(self, matches, loaded_at=0.0, version=0):
+        self.matches = sorted(matches, key=sort_key)
+        self.loaded_at = loaded_at
+        self.version = version
+        # ใช้ทำ ETag: Worker ที่โหลด Slate จากไฟล์เดียวกันจะได้ค่าเดียวกัน
+        self.token = f"{int(loaded_at)}x{len(matches)}"
+
+        self.by_id = {}
+        self.by_league = {}
+        self.by_date = {}
+        self.by_status = {}
+        self.by_league_name = {}
+        for m in self.matches:
+            self.by_id[m["id"]] = m
+            self.by_league_name.setdefault(m.get("league"), []).append(m)
+            league_key = m.get("league_id", m.get("league"))
+            self.by_league.setdefault(league_key, []).append(m)
+            self.by_date.setdefault(m.get("kickoff_time", "")[:10], []).append(m)
+            self.by_status.setdefault(m.get("status"), []).append(m)
+        # วันที่ที่มีแมตช์ (เรียงแล้ว) ใช้ bisect หาช่วงวันของ kickoff_from / kickoff_to
+        self.dates = sorted(self.by_date)
+
+
+class MatchStore:
+    """
+    🗂️ Match Store ที่อยู่ใน Memory ของ Process
+    Refresh แบบ Atomic: สร้าง Snapshot ใหม่ให้เสร็จก่อน แล้วค่อยสลับ Reference
+    ผู้อ่านที่ถือ Snapshot เก่าอยู่จะเห็นข้อมูลชุดเดิมครบทั้งชุดเสมอ
+    """
+    def __init__(self):
+        self._snapshot = MatchSnapshot([])
+        self._view = None
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> MatchSnapshot:
+        return self._snapshot
+
+    @property
+    def is_loaded(self):
+        return self._snapshot.loaded_at > 0
+
+    def is_fresh(self, max_age):
+        return self.is_loaded and (time.time() - self._snapshot.loaded_at) < max_age
+
+    def view(self, overlay):
+        """ Slate + Live Overlay (สร้างใหม่เฉพาะตอน Slate หรือ Overlay เปลี่ยนเวอร์ชัน) """
+        snapshot = self._snapshot
+        view = self._view
+        if view is None or view.snapshot is not snapshot or view.live_version != overlay.version:
+            view = SlateView(snapshot, overlay)
+            self._view = view
+        return view
+
+    def replace(self, matches, loaded_at=None):
+        with self._lock:
+            new_snapshot = MatchSnapshot(
+                matches,
+                loaded_at=loaded_at or time.time(),
+                version=self._snapshot.version + 1,
+            )
+            self._snapshot = new_snapshot
+        return new_snapshot
+
+    def get(self, match_id):
+        return self._snapshot.by_id.get(match_id)
+
+
+class LiveOverlay:
+    """
+    🔥 ตาราง Live State แบบย่อ (fixture id -> status / elapsed / goals) พร้อม version
+    version เพิ่มเฉพาะตอนมีคู่ที่เปลี่ยนจริง -> ผู้อ่านเช็คได้ว่าต้องสร้าง View ใหม่หรือไม่
+    คู่ที่หลุดจาก Feed Live ยังเก็บสกอร์ล่าสุดไว้ (ended_at) จนกว่า Slate ชุดใหม่จะโหลดมาแทน
+    """
+    FIELDS = ("status", "elapsed", "goals_home", "goals_away")
+    ENDED_RETENTION = 86400  # เก็บคู่ที่จบไปแล้วไว้ไม่เกิน 1 วัน
+
+    def __init__(self):
+        self._state = {}     # fixture_id -> {"id", *FIELDS, "ended_at"}
+        self.version = 0
+
+    @staticmethod
+    def compact(live_match):
+        """ แปลง Fixture จาก api-sports ให้เหลือเฉพาะฟิลด์ที่เปลี่ยนระหว่างแข่ง """
+        return {
+            "id": live_match["fixture"]["id"],
+            "status": live_match["fixture"]["status"]["short"],
+            "elapsed": live_match["fixture"]["status"]["elapsed"],
+            "goals_home": live_match["goals"]["home"],
+            "goals_away": live_match["goals"]["away"],
+        }
+
+    def apply(self, live_data):
+        """ อัปเดตจาก Feed Live ชุดใหม่ คืน list ของ Delta (คู่ที่เปลี่ยน / หลุดจาก Feed) """
+        now = time.time()
+        seen = set()
+        deltas = []
+        for live_match in live_data or []:
+            try:
+                item = self.compact(live_match)
+            except (KeyError, TypeError):
+                continue
+            seen.add(item["id"])
+            old = self._state.get(item["id"])
+            if old is None or old["ended_at"] or any(old[f] != item[f] for f in self.FIELDS):
+                self._state[item["id"]] = dict(item, ended_at=None)
+                deltas.append(item)
+
+        for fixture_id, item in list(self._state.items()):
+            if fixture_id in seen: continue
+            if item["ended_at"] is None:
+                # คู่ที่หลุดจาก Feed Live = จบเกม/พักการแข่งขัน
+                item["ended_at"] = now
+                deltas.append({"id": fixture_id, "live": False})
+            elif now - item["ended_at"] > self.ENDED_RETENTION:
+                del self._state[fixture_id]
+
+        if deltas:
+            self.version += 1
+        return deltas
+
+    def live_items(self):
+        """ เฉพาะคู่ที่ยังอยู่ใน Feed Live ตอนนี้ """
+        return [
+            {k: item[k] for k in ("id",) + self.FIELDS}
+            for item in self._state.values() if item["ended_at"] is None
+        ]
+
+    def get(self, fixture_id, slate_loaded_at=0.0):
+        """ Live State ที่ยังใช้ทับ Slate ได้ (คู่ที่จบก่อน Slate ชุดนี้โหลด ถือว่า Slate สดกว่า) """
+        item = self._state.get(fixture_id)
+        if item is None: return None
+        if item["ended_at"] and item["ended_at"] < slate_loaded_at: return None
+        return item
+
+    def items(self):
+        return list(self._state.values())
+
+
+class SlateView:
+    """
+    Snapshot ที่ผสม Live แล้ว (อ่านอย่างเดียว)
+    สร้างครั้งเดียวต่อ (slate version, live version) -> ทุก Request ที่ตามมาใช้ List เดิมได้เลย
+    ไม่แก้ dict ของ Slate: คู่ที่ Live จะเป็น dict ใหม่ที่ copy แล้วทับฟิลด์ Live
+    """
+    def __init__(self, snapshot: MatchSnapshot, overlay: LiveOverlay):
+        self.snapshot = snapshot
+        self.live_version = overlay.version
+
+        self.overrides = {}
+        applied = []
+        for item in overlay.items():
+            base = snapshot.by_id.get(item["id"])
+            if base is None: continue
+            if overlay.get(item["id"], snapshot.loaded_at) is None: continue
+            live = {f: item[f] for f in LiveOverlay.FIELDS}
+            self.overrides[item["id"]] = dict(base, **live)
+            applied.append(dict(live, id=item["id"]))
+
+        # ETag จากทุกค่าที่ทับลง Body จริง (รวมคู่ที่หลุดจาก Feed แล้ว) -> Body ต่าง = ETag ต่าง
+        digest = "0"
+        if applied:
+            raw = json.dumps(sorted(applied, key=lambda x: x["id"]), sort_keys=True)
+            digest = hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+        self.etag = f'W/"{snapshot.token}-{digest}"'
+
+        if self.overrides:
+            self.matches = [self.overrides.get(m["id"], m) for m in snapshot.matches]
+        else:
+            self.matches = snapshot.matches
+
+        # Body ที่ Serialize/บีบอัดแล้ว: (fields, encoding) -> bytes
+        self._rendered = {}
+        # Index ตามกลุ่มสถานะ (หลังผสม Live แล้ว) สร้างตอนถูกใช้ครั้งแรก
+        self._by_status_group = None
+
+    @property
+    def by_status_group(self):
+        if self._by_status_group is None:
+            groups = {}
+            for m in self.matches:
+                groups.setdefault(status_group(m.get("status")), []).append(m)
+            self._by_status_group = groups
+        return self._by_status_group
+
+    def filter(self, league=None, status=None, kickoff_from=None, kickoff_to=None,
+               fixture_ids=None, cursor=None, limit=None):
+        """
+        กรองจาก Index: เลือก List ที่เล็กที่สุดจาก Index ที่ใช้ได้ แล้วเช็คเงื่อนไขที่เหลือ
+        ผลเรียงตาม (kickoff, id) เสมอ -> ใช้ Cursor (kickoff, id ของตัวสุดท้าย) แบ่งหน้าได้ด้วย bisect
+        คืนค่า (items ของหน้านี้, total ทั้งหมดที่ผ่านเงื่อนไข, next_cursor)
+        """
+        candidates = [self.matches]
+        if league is not None:
+            if isinstance(league, int):
+                base = self.snapshot.by_league.get(league, [])
+            else:
+                base = self.snapshot.by_league_name.get(league, [])
+            # ลีกมาจาก Slate ตั้งต้น: แทนที่ด้วยตัวที่ผสม Live แล้ว
+            candidates.append([self.overrides.get(m["id"], m) for m in base])
+        if status is not None:
+            candidates.append(self.by_status_group.get(status, []))
+        if kickoff_from is not None or kickoff_to is not None:
+            # Index วันที่: เอาเฉพาะวันในช่วง (แต่ละวันเรียง (kickoff, id) อยู่แล้ว ต่อกันก็ยังเรียง)
+            dates = self.snapshot.dates
+            lo = bisect.bisect_left(dates, kickoff_from[:10]) if kickoff_from is not None else 0
+            hi = bisect.bisect_right(dates, kickoff_to[:10]) if kickoff_to is not None else len(dates)
+            candidates.append([
+                self.overrides.get(m["id"], m) for date in dates[lo:hi] for m in self.snapshot.by_date[date]
+            ])
+        if fixture_ids is not None:
+            candidates.append([m for m in (self.get(i) for i in fixture_ids) if m is not None])
+        items = min(candidates, key=len)
+        if fixture_ids is not None and items is candidates[-1]:
+            items = sorted(items, key=sort_key)
+
+        league_field = "league_id" if isinstance(league, int) else "league"
+        items = [
+            m for m in items
+            if (league is None or m.get(league_field) == league)
+            and (status is None or status_group(m.get("status")) == status)
+            and (fixture_ids is None or m["id"] in fixture_ids)
+            and (kickoff_from is None or (m.get("kickoff_time") or "") >= kickoff_from)
+            and (kickoff_to is None or (m.get("kickoff_time") or "") <= kickoff_to)
+        ]
+
+        total = len(items)
+        if cursor is not None:
+            items = items[bisect.bisect_right([sort_key(m) for m in items], cursor):]
+        next_cursor = None
+        if limit is not None and len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1])
+        return items, total, next_cursor
+
+    def get(self, match_id):
+        match = self.overrides.get(match_id)
+        return match if match is not None else self.snapshot.by_id.get(match_id)
+
+    def etag_for(self, fields=None):
+        """ ETag ของแต่ละรูปแบบ Response (เลือกฟิลด์ต่างกัน = ETag ต่างกัน) """
+        if not fields: return self.etag
+        key = hashlib.blake2b(",".join(fields).encode("utf-8"), digest_size=4).hexdigest()
+        return self.etag[:-1] + f'-{key}"'
+
+    def render(self, fields=None, encoding="identity"):
+        """
+        JSON ของทั้ง List (ตัดเหลือเฉพาะ fields ถ้าระบุ) แบบบีบอัดตาม encoding
+        Serialize/บีบอัดครั้งเดียวต่อ View แล้ว Request ถัดไปใช้ bytes เดิม
+        """
+        fields = tuple(fields) if fields else None
+        key = (fields, encoding)
+        body = self._rendered.get(key)
+        if body is not None: return body
+
+        if encoding == "identity":
+            matches = self.matches
+            if fields:
+                matches = [{f: m.get(f) for f in fields} for m in matches]
+            body = json.dumps(matches, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        elif encoding == "br":
+            body = brotli.compress(self.render(fields), quality=5)
+        else:
+            body = gzip.compress(self.render(fields), compresslevel=6)
+
+        self._rendered[key] = body
+        return body
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+# bcrypt ใช้ได้แค่ 72 byte แรก (bcrypt >= 5 โยน ValueError ถ้ายาวกว่านี้)
+MAX_PASSWORD_BYTES = 72
+
+
+class HasherBusy(Exception):
+    """ คิว Hash เต็ม (Router ตอบ 503 ให้ Client ลองใหม่) """
+
+
+class PasswordHasher:
+    """
+    🔑 bcrypt ใน Thread Pool จำกัดขนาด (bcrypt ปล่อย GIL ระหว่างคำนวณ)
+    - Login / Register พร้อมกันเยอะๆ ใช้ได้แค่ max_workers Thread -> Threadpool ของ Endpoint อื่นไม่ถูกแย่ง
+    - งานที่รอเกิน max_queue ถูกปฏิเสธทันที (HasherBusy) แทนที่จะค้างจน Timeout
+    - rounds (BCRYPT_ROUNDS): Hash ที่ใช้ rounds ไม่ตรง -> needs_rehash() ให้ Login Hash ใหม่
+    """
+    def __init__(self, rounds=None, max_workers=None, max_queue=None):
+        self.rounds = rounds or int(os.getenv("BCRYPT_ROUNDS", "12"))
+        self.max_workers = max_workers or int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        # 📊 Metrics
+        self.pending = 0        # งานที่ยังไม่เสร็จ (รอคิว + กำลังคำนวณ)
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HasherBusy()
+            self.pending += 1
+        queued_at = time.monotonic()
+
+        def _job():
+            started = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.monotonic()
+                with self._lock:
+                    self.pending -= 1
+                    self.completed += 1
+                    self.wait_total += started - queued_at
+                    self.wait_max = max(self.wait_max, started - queued_at)
+                    self.run_total += finished - started
+
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, _job)
+        except RuntimeError:
+            with self._lock:
+                self.pending -= 1
+            raise
+        # shield: Client ตัดการเชื่อมต่อกลางทาง งานที่อยู่ใน Pool แล้วก็ทำต่อจนจบ (pending นับถูก)
+        return await asyncio.shield(future)
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds)).decode("utf-8")
+
+    @staticmethod
+    def _verify(password, hashed):
+        try:
+            return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+        except ValueError:
+            # Hash ใน DB เสีย / ไม่ใช่ bcrypt
+            return False
+
+    async def hash(self, password):
+        return await self._submit(self._hash, password)
+
+    async def verify(self, password, hashed):
+        if not hashed: return False
+        return await self._submit(self._verify, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """ "$2b$12$..." -> rounds = 12 ไม่ตรงกับค่าปัจจุบัน = ต้อง Hash ใหม่ """
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self.pending,
+                "queued": max(0, self.pending - self.max_workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": round(self.wait_total / self.completed * 1000, 1) if self.completed else 0.0,
+                "max_wait_ms": round(self.wait_max * 1000, 1),
+                "avg_run_ms": round(self.run_total / self.completed * 1000, 1) if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from app.services.ai_engine import AIEngine
+
+
+class PredictionCache:
+    """
+    Cache ผลวิเคราะห์ของ AIEngine (LRU จำกัดขนาด)
+    key = (fixture id, fingerprint ของ input, model version) -> ถ้า stats / odds / injuries / lineups
+    หรือ Rating ที่แมตช์นั้นใช้ (Baseline ลีก / ทีมทั้งสอง) เปลี่ยน key จะเปลี่ยนตาม ทำให้ไม่มีทางได้ผลเก่าที่คำนวณจาก input ชุดเดิม
+    ⚠️ ผลที่คืนไปเป็น object ที่แชร์กัน ห้ามแก้ไข (read-only)
+    """
+    def __init__(self, ai_engine: AIEngine, max_size: int = 2000):
+        self.ai_engine = ai_engine
+        self.max_size = max_size
+        self._entries = OrderedDict()   # (fixture_id, fingerprint, model_version) -> prediction
+        self._by_fixture = {}           # fixture_id -> set ของ key (ไว้ invalidate ทีละแมตช์)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # fixture id ของคู่ที่ AI มี Pick (stats-only) จากการ warm ครั้งล่าสุด
+        self.value_fixture_ids = frozenset()
+
+    @staticmethod
+    def fingerprint(match_data, real_odds=None, injuries=None, lineups=None):
+        """ Hash ของทุก input ที่มีผลต่อผลวิเคราะห์ """
+        payload = {
+            "home_team": match_data.get("home_team"),
+            "away_team": match_data.get("away_team"),
+            "home_id": match_data.get("home_id"),
+            "away_id": match_data.get("away_id"),
+            "home_stats": match_data.get("home_stats"),
+            "away_stats": match_data.get("away_stats"),
+            "odds": real_odds,
+            "injuries": injuries,
+            "lineups": lineups,
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    # --- 💾 LRU Helpers ---
+
+    def _get(self, key):
+        with self._lock:
+            prediction = self._entries.get(key)
+            if prediction is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+
+    def _put(self, key, prediction):
+        with self._lock:
+            self._entries[key] = prediction
+            self._entries.move_to_end(key)
+            self._by_fixture.setdefault(key[0], set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                old_key, _ = self._entries.popitem(last=False)
+                keys = self._by_fixture.get(old_key[0])
+                if keys is not None:
+                    keys.discard(old_key)
+                    if not keys: del self._by_fixture[old_key[0]]
+
+    # --- 🔥 Public API ---
+
+    def get_or_predict(self, match_data, real_odds=None, injuries=None, lineups=None):
+        fixture_id = match_data.get("id")
+        if fixture_id is None:
+            return self.ai_engine.predict_match(match_data, real_odds=real_odds, injuries=injuries, lineups=lineups)
+
+        key = (
+            fixture_id, self.fingerprint(match_data, real_odds, injuries, lineups), self.ai_engine.model_version(match_data)
+        )
+        prediction = self._get(key)
+        if prediction is None:
+            prediction = self.ai_engine.predict_match(
+                match_data, real_odds=real_odds, injuries=injuries, lineups=lineups
+            )
+            self._put(key, prediction)
+        return prediction
+
+    def _resolve(self, matches, details_for=None, count=True):
+        """ (fixture id -> prediction, จำนวนที่ต้องคำนวณใหม่) / ตัวที่ขาดคำนวณด้วย predict_many รอบเดียว """
+        results = {}
+        pending = []
+        for m in matches:
+            if m.get("id") is None: continue
+            real_odds, injuries, lineups = details_for(m["id"]) if details_for else (None, None, None)
+            key = (m["id"], self.fingerprint(m, real_odds, injuries, lineups), self.ai_engine.model_version(m))
+            if count:
+                prediction = self._get(key)
+            else:
+                with self._lock:
+                    prediction = self._entries.get(key)
+            if prediction is None:
+                pending.append((key, m, real_odds, injuries, lineups))
+            else:
+                results[m["id"]] = prediction
+
+        if pending:
+            predictions = self.ai_engine.predict_many(
+                [m for _, m, _, _, _ in pending],
+                real_odds=[p[2] for p in pending],
+                injuries=[p[3] for p in pending],
+                lineups=[p[4] for p in pending],
+            )
+            for (key, *_), prediction in zip(pending, predictions):
+                self._put(key, prediction)
+                results[key[0]] = prediction
+        return results, len(pending)
+
+    def get_many(self, matches, details_for=None):
+        """
+        ผลวิเคราะห์ของหลายแมตช์ (fixture id -> prediction) สำหรับหน้ารายการ (ไม่ยิง Upstream)
+        details_for(fixture_id) -> (odds, injuries, lineups) ที่มีอยู่ในเครื่อง (ไม่มีให้ = stats-only)
+        """
+        return self._resolve(matches, details_for)[0]
+
+    def warm(self, matches, details_for=None):
+        """
+        คำนวณล่วงหน้าทั้ง Slate ด้วย predict_many รอบเดียว
+        และอัปเดต value_fixture_ids (ใช้กรอง "has value pick" ในหน้ารายการแมตช์)
+        details_for(fixture_id) -> (odds, injuries, lineups) ที่มีอยู่ในเครื่อง: ใช้ input ชุดเดียวกับหน้า Analyze
+        key จึงตรงกับที่ get_or_predict จะถาม (ไม่มีให้ = stats-only)
+        """
+        results, computed = self._resolve(matches, details_for, count=False)
+        if computed:
+            print(f"🔥 Prediction cache warmed: {computed} matches")
+        self.value_fixture_ids = frozenset(i for i, p in results.items() if self.has_value_pick(p))
+        return computed
+
+    @staticmethod
+    def has_value_pick(prediction):
+        return prediction["ai_insight"]["main_pick"] != "No Advice"
+
+    def invalidate(self, fixture_id=None):
+        """ ลบผลของแมตช์เดียว หรือทั้งหมดถ้าไม่ระบุ """
+        with self._lock:
+            if fixture_id is None:
+                self._entries.clear()
+                self._by_fixture.clear()
+                return
+            for key in self._by_fixture.pop(fixture_id, set()):
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
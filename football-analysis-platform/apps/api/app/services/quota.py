@@ -0,0 +1,178 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+# Header ของ api-sports: โควตารายวัน (requests) / รายนาที
+DAILY_LIMIT_HEADER = "x-ratelimit-requests-limit"
+DAILY_REMAINING_HEADER = "x-ratelimit-requests-remaining"
+MINUTE_LIMIT_HEADER = "x-ratelimit-limit"
+MINUTE_REMAINING_HEADER = "x-ratelimit-remaining"
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class QuotaManager:
+    """
+    📉 นับ Call ที่ยิงไป api-sports (ต่อ Endpoint) + อ่านโควตาที่เหลือจาก Response Header
+    แล้วคำนวณ stretch: ใช้โควตาเร็วกว่าเวลาที่ผ่านไปของวัน (UTC) เท่าไร ก็ยืด TTL / รอบ Refresh เท่านั้น
+    - stretch = (สัดส่วนเวลาที่เหลือของวัน) / (สัดส่วนโควตาที่เหลือ) จำกัดที่ MAX_STRETCH
+    - live ยืดน้อยกว่า (sqrt) จนกว่าจะถึงโหมด critical (เหลือไม่เกิน QUOTA_RESERVE ของโควตา)
+    - Odds ล่วงหน้า: ดึงเฉพาะคู่ที่มีคนเปิดดูวันนี้ (ODDS_PREFETCH_ALL=1: ดึงทุกคู่ตอนโควตาไม่ตึง) / critical ไม่ดึงเลย
+    ไม่มี Header และไม่ได้ตั้ง API_DAILY_LIMIT -> ไม่รู้โควตา = ไม่ยืด
+    """
+    MAX_STRETCH = 8.0
+
+    def __init__(self, daily_limit=None, reserve=None, odds_min_views=None):
+        daily_limit = daily_limit or os.getenv("API_DAILY_LIMIT")
+        self.configured_limit = int(daily_limit) if daily_limit else None
+        self.reserve = reserve if reserve is not None else float(os.getenv("QUOTA_RESERVE", "0.05"))
+        self.odds_min_views = odds_min_views or int(os.getenv("ODDS_MIN_VIEWS", "1"))
+        self.odds_prefetch_all = os.getenv("ODDS_PREFETCH_ALL", "0") == "1"
+        self._lock = threading.Lock()
+        self._day = None
+        self._reset_day(self._today())
+        self.calls_total = 0
+        self.daily_limit = None
+        self.daily_remaining = None
+        self.minute_limit = None
+        self.minute_remaining = None
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc)
+
+    def _today(self):
+        return self._now().date()
+
+    def _reset_day(self, day):
+        # โควตาของ api-sports รีเซ็ตตอนเที่ยงคืน UTC
+        self._day = day
+        self.calls_today = {}   # endpoint -> จำนวน Call วันนี้
+        self.views = {}         # fixture id -> จำนวนครั้งที่มีคนเปิดวิเคราะห์วันนี้
+        self.daily_remaining = None
+
+    def _roll_day(self):
+        today = self._today()
+        if today != self._day:
+            self._reset_day(today)
+
+    # --- ✍️ Record ---
+
+    def record(self, path, status_code=None, headers=None):
+        """ ทุกครั้งที่ได้ Response จาก Upstream (รวม Retry: นับโควตาเหมือนกัน) """
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        with self._lock:
+            self._roll_day()
+            self.calls_today[path] = self.calls_today.get(path, 0) + 1
+            self.calls_total += 1
+            daily_limit = _int_header(headers, DAILY_LIMIT_HEADER)
+            daily_remaining = _int_header(headers, DAILY_REMAINING_HEADER)
+            if daily_limit is not None: self.daily_limit = daily_limit
+            if daily_remaining is not None: self.daily_remaining = daily_remaining
+            minute_limit = _int_header(headers, MINUTE_LIMIT_HEADER)
+            minute_remaining = _int_header(headers, MINUTE_REMAINING_HEADER)
+            if minute_limit is not None: self.minute_limit = minute_limit
+            if minute_remaining is not None: self.minute_remaining = minute_remaining
+
+    def note_interest(self, fixture_id):
+        """ มีผู้ใช้เปิดวิเคราะห์แมตช์นี้ (ใช้เลือกว่าคู่ไหนควรดึง Odds ล่วงหน้า) """
+        with self._lock:
+            self._roll_day()
+            self.views[fixture_id] = self.views.get(fixture_id, 0) + 1
+
+    # --- 📏 Budget ---
+
+    def budget(self):
+        """ (limit, remaining) ของวันนี้ / (None, None) ถ้าไม่รู้โควตา """
+        with self._lock:
+            self._roll_day()
+            limit = self.daily_limit or self.configured_limit
+            if limit is None:
+                return None, None
+            remaining = self.daily_remaining
+            if remaining is None:
+                # ยังไม่เห็น Header วันนี้: ประมาณจากจำนวน Call ของ Worker นี้เอง
+                remaining = max(0, limit - sum(self.calls_today.values()))
+            return limit, remaining
+
+    def _day_left(self):
+        now = self._now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        return max((midnight - now).total_seconds() / 86400.0, 1e-3)
+
+    def _state(self):
+        """ (stretch, critical) """
+        limit, remaining = self.budget()
+        if limit is None: return 1.0, False
+        if remaining <= limit * self.reserve: return self.MAX_STRETCH, True
+        budget_left = remaining / limit
+        day_left = self._day_left()
+        if budget_left >= day_left: return 1.0, False
+        return min(self.MAX_STRETCH, day_left / max(budget_left, 1e-6)), False
+
+    def is_critical(self):
+        return self._state()[1]
+
+    def stretch(self):
+        """ ตัวคูณ TTL / รอบ Refresh (1.0 = ใช้โควตาตามเวลา ไม่ต้องยืด) """
+        return self._state()[0]
+
+    def scale(self, base, kind):
+        """ ระยะเวลาพื้นฐาน (วินาที) -> ระยะเวลาที่ใช้จริงตามโควตา """
+        stretch, critical = self._state()
+        if kind == "live" and not critical:
+            stretch = stretch ** 0.5
+        return base * stretch
+
+    def should_prefetch_odds(self, fixture_id):
+        stretch, critical = self._state()
+        if critical: return False
+        if self.odds_prefetch_all and stretch <= 1.0: return True
+        with self._lock:
+            return self.views.get(fixture_id, 0) >= self.odds_min_views
+
+    def popularity(self, fixture_id):
+        with self._lock:
+            return self.views.get(fixture_id, 0)
+
+    def stats(self):
+        limit, remaining = self.budget()
+        stretch, critical = self._state()
+        with self._lock:
+            return {
+                "daily_limit": limit,
+                "daily_remaining": remaining,
+                "minute_limit": self.minute_limit,
+                "minute_remaining": self.minute_remaining,
+                "calls_today": sum(self.calls_today.values()),
+                "calls_by_endpoint": dict(self.calls_today),
+                "calls_total": self.calls_total,
+                "stretch": round(stretch, 2),
+                "critical": critical,
+            }
+
+
+class QuotaScaled:
+    """
+    Attribute ระยะเวลา (วินาที) ที่ยืดตาม Quota ของ obj.quota
+    ตั้งค่า = ค่าพื้นฐาน / อ่าน = quota.scale(ค่าพื้นฐาน, kind)
+    """
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __set_name__(self, owner, name):
+        self.name = "_base_" + name
+
+    def __get__(self, obj, owner=None):
+        if obj is None: return self
+        base = obj.__dict__[self.name]
+        quota = obj.__dict__.get("quota")
+        return base if quota is None else quota.scale(base, self.kind)
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
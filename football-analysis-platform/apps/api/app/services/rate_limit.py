@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# capacity = จำนวนครั้งที่ยิงติดกันได้ (Burst) / refill = token ที่ได้คืนต่อวินาที
+Rule = namedtuple("Rule", ["capacity", "refill"])
+RateLimitResult = namedtuple("RateLimitResult", ["allowed", "limit", "remaining", "retry_after"])
+
+DEFAULT_RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join("data_cache", "rate_limit.db"))
+
+
+def parse_rule(text):
+    """ "30/3600" -> Rule(30 ครั้ง, เติมเต็มใน 3600 วินาที) """
+    count, _, period = text.partition("/")
+    capacity = float(count)
+    return Rule(capacity, capacity / float(period or 1))
+
+def _refill(tokens, updated, rule, now):
+    return min(rule.capacity, tokens + max(0.0, now - updated) * rule.refill)
+
+def _result(allowed, tokens, rule, cost):
+    retry_after = 0.0 if allowed else (cost - tokens) / rule.refill if rule.refill > 0 else float("inf")
+    return RateLimitResult(allowed, int(rule.capacity), int(tokens), retry_after)
+
+
+class MemoryBucketBackend:
+    """ Token Bucket ใน Process (เร็วสุด แต่แต่ละ Worker นับแยกกัน) """
+    blocking = False
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}   # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, key, rule, cost=1.0, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = rule.capacity if bucket is None else _refill(bucket[0], bucket[1], rule, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = [tokens, now]
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return _result(allowed, tokens, rule, cost)
+
+    def _prune(self, now):
+        # Bucket ที่ไม่ได้ใช้นานจนน่าจะเต็มแล้ว ลบทิ้งได้ (ถ้ากลับมาใหม่ก็เริ่มเต็มเหมือนกัน)
+        idle = sorted(self._buckets.items(), key=lambda item: item[1][1])
+        for key, _ in idle[:len(idle) // 2]:
+            del self._buckets[key]
+
+    def close(self):
+        pass
+
+
+class SQLiteBucketBackend:
+    """
+    Token Bucket ใน SQLite (WAL) ไฟล์เดียว: ทุก uvicorn Worker ใช้ Bucket ชุดเดียวกัน
+    แต่ละ take() เป็น Transaction แบบ BEGIN IMMEDIATE (อ่าน-คำนวณ-เขียน ไม่ชนกันข้าม Process)
+    """
+    blocking = True
+
+    def __init__(self, path: str = DEFAULT_RATE_LIMIT_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def take(self, key, rule, cost=1.0, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = rule.capacity if row is None else _refill(row[0], row[1], rule, now)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return _result(allowed, tokens, rule, cost)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    """
+    🚦 Rate Limit แบบ Token Bucket แยกตาม scope
+    - user:     ต่อ User (tier free / premium ตาม User.is_premium)
+    - ip:       ต่อ IP (กัน Scraper ที่สมัครหลาย Account)
+    - upstream: ต่อ Endpoint ของ api-sports (กัน Quota ของทั้งระบบหมด)
+    กติกาตั้งผ่าน env รูปแบบ "จำนวน/วินาที" เช่น RATE_LIMIT_USER_FREE=120/3600
+    user / ip นับเฉพาะการวิเคราะห์ที่ต้องยิง Upstream + 1 ครั้งต่อการโหลด Dashboard (/matches/predictions)
+    - Dashboard 1 ครั้ง = 1 / เปิดหน้า Analyze ของคู่ที่ข้อมูลยังไม่อยู่ในเครื่อง = 1 (คู่ที่ Cache แล้วไม่นับ)
+    - ip ตั้งสูงกว่า user หลายเท่า: คนหลัง NAT / Proxy เดียวกันใช้ Bucket นี้ร่วมกัน (กันแค่ Scraper หลาย Account)
+    RATE_LIMIT_BACKEND=sqlite -> ใช้ Bucket ร่วมกันทุก Worker (ค่า Default: memory)
+    """
+    DEFAULT_RULES = {
+        ("user", "free"): ("RATE_LIMIT_USER_FREE", "120/3600"),
+        ("user", "premium"): ("RATE_LIMIT_USER_PREMIUM", "1200/3600"),
+        ("ip", "default"): ("RATE_LIMIT_IP", "3000/3600"),
+        ("upstream", "default"): ("RATE_LIMIT_UPSTREAM", "300/60"),
+    }
+
+    def __init__(self, backend=None, rules=None):
+        if backend is None:
+            backend = SQLiteBucketBackend() if os.getenv("RATE_LIMIT_BACKEND", "memory") == "sqlite" else MemoryBucketBackend()
+        self.backend = backend
+        self.rules = rules or {
+            key: parse_rule(os.getenv(env_name, default)) for key, (env_name, default) in self.DEFAULT_RULES.items()
+        }
+        self.enabled = os.getenv("RATE_LIMIT", "1") != "0"
+        self._lock = threading.Lock()
+        self.allowed = {}   # scope -> จำนวนครั้งที่ผ่าน
+        self.denied = {}    # scope -> จำนวนครั้งที่โดนจำกัด
+
+    @property
+    def blocking(self):
+        """ take() มี I/O (SQLite) -> ฝั่ง async ควรเรียกผ่าน Threadpool """
+        return self.backend.blocking
+
+    def rule(self, scope, tier="default"):
+        return self.rules.get((scope, tier)) or self.rules[(scope, "default")]
+
+    def hit(self, scope, identity, tier="default", cost=1.0):
+        """ ใช้ cost token จาก Bucket ของ (scope, identity) """
+        rule = self.rule(scope, tier)
+        if not self.enabled:
+            return RateLimitResult(True, int(rule.capacity), int(rule.capacity), 0.0)
+        result = self.backend.take(f"{scope}:{tier}:{identity}", rule, cost)
+        with self._lock:
+            counter = self.allowed if result.allowed else self.denied
+            counter[scope] = counter.get(scope, 0) + 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "enabled": self.enabled,
+                "allowed": dict(self.allowed),
+                "denied": dict(self.denied),
+            }
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,301 @@
+import abc
+import math
+import os
+import threading
+from datetime import datetime
+
+from app.services.archive import FINISHED_STATUSES
+
+# ค่าเฉลี่ยประตูตั้งต้น (ค่าเดิมของ AIEngine) ใช้กับลีกที่ยังไม่มีผลการแข่งขันพอ
+DEFAULT_HOME_GOALS = 1.5
+DEFAULT_AWAY_GOALS = 1.2
+
+
+def _days(iso_date):
+    """ "2025-01-01T15:00:00+00:00" -> จำนวนวัน (float) ใช้คิด Time Decay """
+    return datetime.fromisoformat(iso_date.replace("Z", "+00:00")).timestamp() / 86400.0
+
+
+class LeagueBaselines:
+    """
+    ⚖️ ค่าเฉลี่ยประตูเหย้า / เยือนแยกรายลีก (Exponential Moving Average: อัปเดต O(1) ต่อผลการแข่งขัน)
+    ช่วงแรกของลีกถ่วงด้วยค่าตั้งต้น (prior_weight นัด) แล้วค่อยๆ เชื่อข้อมูลจริงมากขึ้น
+    """
+    def __init__(self, prior_weight=20, window=400):
+        self.prior_weight = prior_weight
+        self.window = window
+        self.leagues = {}   # league_id -> [home_avg, away_avg, matches]
+
+    def get(self, league_id):
+        state = self.leagues.get(league_id)
+        if state is None:
+            return DEFAULT_HOME_GOALS, DEFAULT_AWAY_GOALS
+        return state[0], state[1]
+
+    def update(self, league_id, home_goals, away_goals):
+        state = self.leagues.setdefault(league_id, [DEFAULT_HOME_GOALS, DEFAULT_AWAY_GOALS, 0])
+        alpha = max(1.0 / (state[2] + self.prior_weight), 1.0 / self.window)
+        state[0] += alpha * (home_goals - state[0])
+        state[1] += alpha * (away_goals - state[1])
+        state[2] += 1
+
+    def to_dict(self):
+        return {str(k): list(v) for k, v in self.leagues.items()}
+
+    def load_dict(self, data):
+        self.leagues = {int(k): list(v) for k, v in data.items()}
+
+
+class RatingModel(abc.ABC):
+    """
+    Base ของโมเดลค่าพลังทีมแบบ Incremental (อัปเดตทีละผลการแข่งขัน)
+    strength() คืนตัวคูณ (attack, defense) ความหมายเดียวกับ stats จากตารางคะแนน
+    - attack:  ยิงได้กี่เท่าของค่าเฉลี่ยลีก
+    - defense: เสียกี่เท่าของค่าเฉลี่ยลีก (มาก = เกมรับแย่)
+    """
+    name = "base"
+    # จำนวนนัดขั้นต่ำก่อนจะเชื่อค่าพลังของทีม
+    MIN_MATCHES = 5
+
+    def __init__(self):
+        self.teams = {}
+
+    @abc.abstractmethod
+    def update(self, baselines, league_id, home_id, away_id, home_goals, away_goals, played_at):
+        """ อัปเดตค่าพลังจากผลการแข่งขัน 1 นัด """
+
+    @abc.abstractmethod
+    def strength(self, team_id):
+        """ (attack, defense) / None ถ้ายังไม่มีข้อมูลพอ """
+
+    def to_dict(self):
+        return {str(k): list(v) for k, v in self.teams.items()}
+
+    def load_dict(self, data):
+        self.teams = {int(k): list(v) for k, v in data.items()}
+
+
+class DixonColesRatings(RatingModel):
+    """
+    Dixon-Coles แบบ Online: log(lambda_home) = log(base_home) + attack_home + defense_away
+    - อัปเดตด้วย Gradient ของ Poisson Log-likelihood (goals - lambda) ทีละนัด
+    - Time Decay: ค่าพลังหดกลับหา 0 ด้วย exp(-xi * วันที่ห่างจากนัดก่อน) (ข้อมูลเก่ามีน้ำหนักน้อยลง)
+    team state: [attack, defense, matches, last_played_day]
+    """
+    name = "dixon_coles"
+
+    def __init__(self, learning_rate=0.05, xi=0.0019):
+        super().__init__()
+        self.learning_rate = learning_rate
+        self.xi = xi  # ≈ half-life 1 ปี
+
+    def _team(self, team_id, day):
+        state = self.teams.setdefault(team_id, [0.0, 0.0, 0, day])
+        decay = math.exp(-self.xi * max(0.0, day - state[3]))
+        state[0] *= decay
+        state[1] *= decay
+        state[3] = day
+        return state
+
+    def update(self, baselines, league_id, home_id, away_id, home_goals, away_goals, played_at):
+        day = _days(played_at)
+        home, away = self._team(home_id, day), self._team(away_id, day)
+        base_home, base_away = baselines.get(league_id)
+
+        home_lambda = base_home * math.exp(home[0] + away[1])
+        away_lambda = base_away * math.exp(away[0] + home[1])
+        home_error = home_goals - home_lambda
+        away_error = away_goals - away_lambda
+
+        lr = self.learning_rate
+        home[0] += lr * home_error
+        away[1] += lr * home_error
+        away[0] += lr * away_error
+        home[1] += lr * away_error
+        home[2] += 1
+        away[2] += 1
+
+    def strength(self, team_id):
+        state = self.teams.get(team_id)
+        if state is None or state[2] < self.MIN_MATCHES: return None
+        return math.exp(state[0]), math.exp(state[1])
+
+
+class EloGoalRatings(RatingModel):
+    """
+    Elo แบบผลต่างประตู: rating หน่วยเป็น log-goal
+    lambda_home = base_home * exp((r_home - r_away) / 2) / lambda_away = base_away * exp((r_away - r_home) / 2)
+    หลังจบเกม: r += k * (ผลต่างประตูจริง - ผลต่างที่คาด)
+    team state: [rating, matches]
+    """
+    name = "elo"
+
+    def __init__(self, k=0.04):
+        super().__init__()
+        self.k = k
+
+    def update(self, baselines, league_id, home_id, away_id, home_goals, away_goals, played_at):
+        home = self.teams.setdefault(home_id, [0.0, 0])
+        away = self.teams.setdefault(away_id, [0.0, 0])
+        base_home, base_away = baselines.get(league_id)
+
+        diff = home[0] - away[0]
+        expected_gd = base_home * math.exp(diff / 2) - base_away * math.exp(-diff / 2)
+        delta = self.k * ((home_goals - away_goals) - expected_gd)
+        home[0] += delta
+        away[0] -= delta
+        home[1] += 1
+        away[1] += 1
+
+    def strength(self, team_id):
+        state = self.teams.get(team_id)
+        if state is None or state[1] < self.MIN_MATCHES: return None
+        return math.exp(state[0] / 2), math.exp(-state[0] / 2)
+
+
+RATING_MODELS = {model.name: model for model in (DixonColesRatings, EloGoalRatings)}
+
+
+class RatingEngine:
+    """
+    📐 รวม League Baselines + Rating Models ทุกตัว แล้วอัปเดตจากผลการแข่งขันที่จบแล้ว (ทีละนัด O(1))
+    - ข้อมูลเข้ามาจาก Fixture ที่ FootballDataService ดึงมา (result_listeners) ไม่ต้องรอ Refresh ตารางคะแนน
+    - active_model: โมเดลที่ AIEngine ใช้แทนค่าพลังจากตารางคะแนน (RATING_MODEL=standings = ไม่ใช้)
+    - State ถูกเก็บลง Cache Store (key "ratings_v2") และ Rebuild จาก FixtureArchive ได้
+    - version_for(): Version เฉพาะส่วนที่แมตช์นั้นใช้ (Baseline ของลีก + ทีมทั้งสองถ้าใช้ Rating Model)
+      ผลนัดใหม่จึง Invalidate เฉพาะ Prediction ที่ได้รับผลจริง ไม่ใช่ทั้ง Cache
+    - จำ fixture id ที่นับแล้วเฉพาะนัดในช่วง SEEN_WINDOW_DAYS วันล่าสุด / นัดที่เก่ากว่านั้นไม่นำมาคิด
+    - ผลใหม่แค่ตั้ง dirty: save_if_dirty() ถูกเรียกเป็นรอบจาก BackgroundRefresher (ใน Thread) และตอน Shutdown
+      ไม่เขียนทับ State ที่ Worker อื่นบันทึกไว้ถ้าในนั้นมีผลที่ Worker นี้ยังไม่เห็น
+    """
+    # v2: seen เป็น {fixture id: วัน} (State แบบเดิมถูก Rebuild จาก Archive)
+    STATE_KEY = "ratings_v2"
+    SEEN_WINDOW_DAYS = float(os.getenv("RATINGS_SEEN_DAYS", "400"))
+    # บันทึก State ลง Cache Store อย่างมากทุกกี่วินาที
+    SAVE_INTERVAL = float(os.getenv("RATINGS_SAVE_INTERVAL", "300"))
+
+    def __init__(self, cache=None, active=None):
+        self.cache = cache
+        self.baselines = LeagueBaselines()
+        self.models = {name: cls() for name, cls in RATING_MODELS.items()}
+        active = active or os.getenv("RATING_MODEL", "standings")
+        self.active_model = self.models.get(active)
+        # version: เปลี่ยนเมื่อโหลด State ใหม่ทั้งชุด / ผลรายนัดเปลี่ยนแค่ Version ของลีก / ทีมนั้น
+        self.version = 0
+        self._league_versions = {}
+        self._team_versions = {}
+        self._seen = {}          # fixture id -> วันที่แข่ง (ใช้ตัดนัดที่หลุดช่วงเวลา)
+        self._latest_day = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def observe(self, league_id, fixture_id, home_id, away_id, home_goals, away_goals, played_at):
+        """ ผลการแข่งขัน 1 นัด (นัดที่เคยเห็นแล้ว / เก่าเกินช่วงเวลาจะถูกข้าม) คืน True ถ้ามีการอัปเดต """
+        if fixture_id in self._seen or home_goals is None or away_goals is None:
+            return False
+        day = _days(played_at)
+        if self._latest_day is not None and day < self._latest_day - self.SEEN_WINDOW_DAYS:
+            return False
+        self._seen[fixture_id] = day
+        self._latest_day = day if self._latest_day is None else max(self._latest_day, day)
+        # อัปเดตโมเดลด้วย Baseline ก่อนนัดนี้ แล้วค่อยอัปเดต Baseline
+        for model in self.models.values():
+            model.update(self.baselines, league_id, home_id, away_id, home_goals, away_goals, played_at)
+        self.baselines.update(league_id, home_goals, away_goals)
+        self._league_versions[league_id] = self._league_versions.get(league_id, 0) + 1
+        for team_id in (home_id, away_id):
+            self._team_versions[team_id] = self._team_versions.get(team_id, 0) + 1
+        return True
+
+    def _prune_seen(self):
+        if self._latest_day is None: return
+        cutoff = self._latest_day - self.SEEN_WINDOW_DAYS
+        self._seen = {fixture_id: day for fixture_id, day in self._seen.items() if day >= cutoff}
+
+    def prune(self):
+        """ ลืม fixture id ที่หลุดช่วง SEEN_WINDOW_DAYS (เรียกก่อนบันทึก / ส่ง State) """
+        with self._lock:
+            self._prune_seen()
+
+    def version_for(self, league_id, home_id, away_id):
+        """ Version ของทุกอย่างที่ใช้ทำนายแมตช์นี้ (Baseline ลีก / ค่าพลังทีมจาก active_model) """
+        league = self._league_versions.get(league_id, 0)
+        if self.active_model is None:
+            return self.version, league
+        return self.version, league, self._team_versions.get(home_id, 0), self._team_versions.get(away_id, 0)
+
+    def observe_fixtures(self, items):
+        """ Listener: item ดิบของ /fixtures (เอาเฉพาะนัดที่จบแล้ว เรียงตามเวลาเตะ) """
+        finished = sorted(
+            (i for i in items if i["fixture"]["status"]["short"] in FINISHED_STATUSES),
+            key=lambda i: i["fixture"]["date"],
+        )
+        with self._lock:
+            updated = sum(
+                self.observe(
+                    i["league"]["id"], i["fixture"]["id"],
+                    i["teams"]["home"]["id"], i["teams"]["away"]["id"],
+                    i["goals"]["home"], i["goals"]["away"], i["fixture"]["date"],
+                )
+                for i in finished
+            )
+            if updated:
+                self._dirty = True
+        return updated
+
+    # --- 💾 State ---
+
+    def state(self):
+        """ State ทั้งหมดเป็น dict (JSON ได้ / ส่งข้าม Process ได้) """
+        return {
+            "baselines": self.baselines.to_dict(),
+            "models": {name: model.to_dict() for name, model in self.models.items()},
+            "seen": {str(k): v for k, v in self._seen.items()},
+        }
+
+    def load_state(self, state):
+        with self._lock:
+            self.baselines.load_dict(state["baselines"])
+            for name, data in state["models"].items():
+                if name in self.models:
+                    self.models[name].load_dict(data)
+            self._seen = {int(k): v for k, v in state["seen"].items()}
+            self._latest_day = max(self._seen.values(), default=None)
+            self.version += 1
+
+    def save(self):
+        if self.cache is None: return
+        self.cache.set(self.STATE_KEY, self.state())
+
+    def save_if_dirty(self):
+        """ บันทึกถ้ามีผลใหม่ตั้งแต่ครั้งก่อน (เรียกจาก Thread ไม่ใช่ Event Loop) คืน True ถ้าเขียน """
+        if self.cache is None or not self._dirty: return False
+        with self._lock:
+            self._prune_seen()
+            state = self.state()
+            self._dirty = False
+        # State ของ Worker อื่นมีผลที่เรายังไม่เห็น -> ไม่เขียนทับ (ไม่ให้ผลหายแบบ Last-writer-wins)
+        stored = self.cache.get(self.STATE_KEY)
+        if stored:
+            cutoff = self._latest_day - self.SEEN_WINDOW_DAYS
+            if any(day >= cutoff and fixture_id not in state["seen"] for fixture_id, day in stored["seen"].items()):
+                return False
+        self.cache.set(self.STATE_KEY, state)
+        return True
+
+    def load(self, archive=None):
+        """ โหลด State จาก Cache Store / ถ้าไม่มี Replay ผลทั้งหมดจาก Archive ตามลำดับเวลา """
+        state = self.cache.get(self.STATE_KEY) if self.cache is not None else None
+        if state:
+            self.load_state(state)
+            print(f"📐 Ratings loaded: {len(self._seen)} results")
+            return
+        if archive is not None:
+            updated = self.observe_fixtures(archive.finished_fixtures())
+            self.save_if_dirty()
+            print(f"📐 Ratings rebuilt from archive: {updated} results")
+
+    def strength(self, team_id):
+        """ ตัวคูณ (attack, defense) จาก active_model / None ถ้าไม่ได้ใช้โมเดล หรือยังไม่มีข้อมูลพอ """
+        if self.active_model is None or team_id is None: return None
+        return self.active_model.strength(team_id)
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+
+class SingleFlight:
+    """
+    กัน Stampede: งานที่ key เดียวกันจะมีแค่ตัวเดียวที่กำลังรัน
+    คนที่มาทีหลังจะรอผลของงานตัวเดิม (ไม่ยิง Upstream ซ้ำ)
+    """
+    def __init__(self):
+        self._inflight = {}
+
+    def _start(self, key, coro_factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_factory())
+            self._inflight[key] = task
+
+            def _done(t, key=key):
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if not t.cancelled() and t.exception() is not None:
+                    print(f"⚠️ Task {key} failed: {t.exception()}")
+            task.add_done_callback(_done)
+        return task
+
+    async def run(self, key, coro_factory):
+        """ รอผล (shield ไว้: ถ้า Request ที่รออยู่ถูก Cancel งานที่แชร์กันยังรันต่อ) """
+        return await asyncio.shield(self._start(key, coro_factory))
+
+    def spawn(self, key, coro_factory):
+        """ สั่งรันใน Background โดยไม่รอผล (ใช้กับ Stale-while-revalidate) """
+        self._start(key, coro_factory)
+
+    def is_running(self, key):
+        return key in self._inflight
+
+
+class BackgroundRefresher:
+    """
+    ⏰ Refresh ข้อมูลตามรอบของแต่ละประเภท เพื่อไม่ให้ Request ของผู้ใช้ต้องรอ Rebuild
+    - slate:     ทุก MATCHES_CACHE_DURATION
+    - live:      ทุก LIVE_CACHE_DURATION
+    - standings: ทุก STATS_CACHE_DURATION (เฉพาะลีกที่อยู่ใน Slate)
+    - odds:      ทุก ODDS_CACHE_DURATION (เฉพาะคู่ที่ยังไม่เตะภายใน ODDS_PREFETCH_WINDOW และมีคนเปิดดู)
+    - ratings:   ทุก RatingEngine.SAVE_INTERVAL บันทึก Rating ที่เปลี่ยนลง Cache Store (ใน Thread)
+    ทุกงานวิ่งผ่าน SingleFlight ตัวเดียวกับฝั่ง Request จึงไม่ซ้อนกัน
+    รอบเวลาอ่านใหม่ทุกรอบ -> ยืดตามโควตา api-sports ที่เหลือ (live ยืดน้อยสุด)
+    """
+    def __init__(self, football_service, ratings=None):
+        self.service = football_service
+        self.ratings = ratings
+        self._tasks = []
+
+    def start(self):
+        svc = self.service
+        # (ชื่อ, รอบเวลา, งาน, รอครบรอบก่อนรันครั้งแรก)
+        # standings รอก่อน เพราะการ Rebuild Slate ดึงตารางคะแนนของลีกใน Slate ให้อยู่แล้ว
+        jobs = [
+            ("slate", lambda: svc.MATCHES_CACHE_DURATION, self.refresh_slate, False),
+            ("live", lambda: svc.LIVE_CACHE_DURATION, self.refresh_live, False),
+            ("standings", lambda: svc.STATS_CACHE_DURATION, self.refresh_standings, True),
+            ("odds", lambda: svc.ODDS_CACHE_DURATION, self.refresh_odds, False),
+        ]
+        if self.ratings is not None:
+            jobs.append(("ratings", lambda: self.ratings.SAVE_INTERVAL, self.save_ratings, True))
+        for name, interval, job, delay_first in jobs:
+            self._tasks.append(asyncio.create_task(self._loop(name, interval, job, delay_first)))
+        print(f"⏰ Background refresher started: {[job[0] for job in jobs]}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, name, interval, job, delay_first=False):
+        if delay_first:
+            await asyncio.sleep(interval())
+        while True:
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Refresher job '{name}' failed: {e}")
+            await asyncio.sleep(interval())
+
+    # --- 🔄 Jobs ---
+
+    async def refresh_slate(self):
+        svc = self.service
+        if not svc.match_store.is_fresh(svc.MATCHES_CACHE_DURATION):
+            await svc.flights.run("slate", svc._refresh_slate)
+
+    async def refresh_live(self):
+        await self.service.flights.run("live", self.service._refresh_live_data)
+
+    async def refresh_standings(self):
+        svc = self.service
+        league_ids = {m["league_id"] for m in svc.match_store.snapshot.matches if m.get("league_id")}
+        if not league_ids: return
+        current_year = datetime.now().year
+        season = current_year if datetime.now().month >= 7 else current_year - 1
+        await svc._fetch_stats_for_leagues(league_ids, season)
+
+    async def save_ratings(self):
+        await asyncio.to_thread(self.ratings.save_if_dirty)
+
+    async def refresh_odds(self):
+        svc = self.service
+        await asyncio.to_thread(svc.prune_odds_cache)
+        now = datetime.now(timezone.utc)
+        window_end = now + timedelta(seconds=svc.ODDS_PREFETCH_WINDOW)
+
+        targets = []
+        for m in svc.match_store.snapshot.by_status.get("NS", []):
+            try:
+                kickoff = datetime.fromisoformat(m["kickoff_time"])
+            except (KeyError, ValueError):
+                continue
+            if now <= kickoff <= window_end and not svc.is_odds_fresh(m["id"]):
+                # ข้ามคู่ที่ไม่มีคนเปิดดู (ผู้ใช้เปิดเมื่อไรก็ดึงตอนนั้น) / Odds อยู่ใน Cache Store ร่วมกันทุก Worker
+                if svc.quota.should_prefetch_odds(m["id"]):
+                    targets.append(m["id"])
+
+        if not targets: return
+        # คู่ที่มีคนดูมากก่อน
+        targets.sort(key=svc.quota.popularity, reverse=True)
+        semaphore = asyncio.Semaphore(svc.STATS_FETCH_CONCURRENCY)
+
+        async def refresh_one(match_id):
+            async with semaphore:
+                await svc.flights.run(f"odds:{match_id}", lambda: svc._fetch_match_odds(match_id))
+
+        started = time.time()
+        await asyncio.gather(*(refresh_one(mid) for mid in targets))
+        print(f"✅ Odds refreshed for {len(targets)} matches ({time.time() - started:.1f}s)")
+        # Odds เปลี่ยน -> warm Prediction Cache ใหม่ (key ตรงกับหน้า Analyze) ใน Thread
+        await asyncio.to_thread(svc._notify_listeners, svc.slate_listeners, svc.match_store.snapshot.matches)
@@ -0,0 +1,175 @@
+import contextlib
+import os
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows: ไม่มี flock (Dev เครื่องเดียว ใช้แค่ Thread Lock)
+    fcntl = None
+
+DEFAULT_TABLE_PATH = os.getenv("TEAM_TABLE_PATH", os.path.join("data_cache", "team_strength.npy"))
+
+# 1 แถว = 1 ทีมใน 1 ลีก (ทีมเดียวกันอยู่ได้หลายลีก เช่น ลีกในประเทศ + ถ้วยยุโรป)
+TEAM_DTYPE = np.dtype([
+    ("team_id", "<i8"),
+    ("league_id", "<i4"),
+    ("attack", "<f4"),
+    ("defense", "<f4"),
+    ("form", "<u2"),    # ฟอร์ม 5 นัดล่าสุด: 2 bit ต่อนัด (ดู encode_form)
+])
+
+FORM_CODES = {"L": 1, "D": 2, "W": 3}
+FORM_CHARS = {code: char for char, code in FORM_CODES.items()}
+DEFAULT_STATS = {"attack": 1.0, "defense": 1.0, "form": "-----"}
+
+
+def encode_form(form):
+    """ "WWDLW" -> uint16 (นัดล่าสุดอยู่ bit ต่ำสุด, 0 = ไม่มีข้อมูล) """
+    code = 0
+    for char in (form or "")[-5:]:
+        code = (code << 2) | FORM_CODES.get(char, 0)
+    return code
+
+def decode_form(code):
+    chars = []
+    code = int(code)
+    while code:
+        chars.append(FORM_CHARS.get(code & 3, "-"))
+        code >>= 2
+    return "".join(reversed(chars)) or "-----"
+
+
+class TeamStrengthTable:
+    """
+    📊 ตารางค่าพลังทีมแบบ Columnar (NumPy structured array) แทน dict ชื่อทีม -> stats
+    - Key เป็น (league_id, team_id) ไม่ใช่ชื่อทีม -> ทีมชื่อซ้ำต่างลีกไม่ทับกัน
+    - เก็บเป็นไฟล์ .npy แล้วเปิดแบบ mmap (read-only): ทุก Worker ใช้ Page Cache ชุดเดียวกัน
+    - เขียนแบบ Atomic (ไฟล์ชั่วคราว + os.replace) แล้ว Worker อื่นโหลดใหม่เมื่อเห็นไฟล์เปลี่ยน
+    - ผู้เขียนถือ flock ของไฟล์ .lock แล้วอ่านไฟล์ล่าสุดก่อน Merge (Worker อื่นเขียนลีกอื่นไว้ไม่หาย)
+    """
+    def __init__(self, path: str = DEFAULT_TABLE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._set_records(np.zeros(0, dtype=TEAM_DTYPE))
+        self.refresh()
+
+    def _set_records(self, records):
+        # Index: (league_id, team_id) -> row / team_id -> row (ใช้ตอนไม่รู้ลีก)
+        self.records = records
+        league_ids = records["league_id"].tolist()
+        team_ids = records["team_id"].tolist()
+        self._index = {key: i for i, key in enumerate(zip(league_ids, team_ids))}
+        self._by_team = {team_id: i for i, team_id in enumerate(team_ids)}
+        self._leagues = set(league_ids)
+
+    def refresh(self):
+        """ โหลดไฟล์ใหม่ถ้ามี Worker อื่นเขียนทับ (เช็คจาก mtime) """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            records = np.load(self.path, mmap_mode="r")
+            if records.dtype != TEAM_DTYPE:
+                print(f"⚠️ Team table {self.path} has unexpected dtype, ignored")
+                return False
+            self._set_records(records)
+            self._mtime = mtime
+        return True
+
+    def __len__(self):
+        return len(self.records)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """ Lock ข้าม Process ระหว่าง อ่าน -> Merge -> os.replace """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # --- ✍️ Write ---
+
+    def update_league(self, league_id, teams):
+        """ แทนที่ทุกทีมของลีกนี้ด้วยชุดใหม่ teams: [(team_id, attack, defense, form_str)] """
+        new_rows = np.array(
+            [(team_id, league_id, attack, defense, encode_form(form)) for team_id, attack, defense, form in teams],
+            dtype=TEAM_DTYPE,
+        )
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, self._file_lock():
+            # อ่านจากไฟล์ (ไม่ใช่ self.records ที่อาจเก่า) -> ไม่ทับลีกที่ Worker อื่นเพิ่งเขียน
+            current = self.records
+            if os.path.exists(self.path):
+                on_disk = np.load(self.path, mmap_mode="r")
+                if on_disk.dtype == TEAM_DTYPE:
+                    current = on_disk
+            kept = current[current["league_id"] != league_id]
+            merged = np.concatenate([np.asarray(kept), new_rows])
+            merged = merged[np.lexsort((merged["team_id"], merged["league_id"]))]
+
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, merged)
+            os.replace(tmp_path, self.path)
+
+            self._set_records(np.load(self.path, mmap_mode="r"))
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    # --- 🔎 Read ---
+
+    def row(self, team_id, league_id=None):
+        """ ตำแหน่งแถวของทีม (ลีกที่ระบุก่อน ไม่เจอค่อยใช้ลีกไหนก็ได้) / None ถ้าไม่มี """
+        if team_id is None: return None
+        i = self._index.get((league_id, team_id)) if league_id is not None else None
+        return i if i is not None else self._by_team.get(team_id)
+
+    def has(self, team_id, league_id=None):
+        return self.row(team_id, league_id) is not None
+
+    def has_league(self, league_id):
+        return league_id in self._leagues
+
+    def get(self, team_id, league_id=None):
+        """ stats dict รูปแบบเดิม {"attack", "defense", "form"} / None ถ้าไม่มี """
+        i = self.row(team_id, league_id)
+        if i is None: return None
+        rec = self.records[i]
+        return {
+            "attack": round(float(rec["attack"]), 2),
+            "defense": round(float(rec["defense"]), 2),
+            "form": decode_form(rec["form"]),
+        }
+
+    def gather(self, team_ids, league_ids=None):
+        """
+        ดึงทั้ง Batch ด้วย Index เดียว: คืน (attack, defense, form_code, found)
+        ทีมที่ไม่มีในตารางได้ค่า Default (1.0, 1.0, 0) และ found=False
+        """
+        league_ids = league_ids if league_ids is not None else [None] * len(team_ids)
+        rows = np.array(
+            [-1 if (i := self.row(t, l)) is None else i for t, l in zip(team_ids, league_ids)],
+            dtype=np.int64,
+        )
+        found = rows >= 0
+        picked = self.records[np.where(found, rows, 0)] if len(self.records) else None
+
+        attack = np.ones(len(rows), dtype=np.float32)
+        defense = np.ones(len(rows), dtype=np.float32)
+        form = np.zeros(len(rows), dtype=np.uint16)
+        if picked is not None:
+            attack[found] = picked["attack"][found]
+            defense[found] = picked["defense"][found]
+            form[found] = picked["form"][found]
+        return attack, defense, form, found
@@ -45,9 +45,8 @@ interface BackendPrediction {
   };
 }
 
-interface AnalysisResponse {
-  match_info: Match;
-  ai_analysis: BackendPrediction;
+interface PredictionsResponse {
+  predictions: Record<string, BackendPrediction>;
 }
 
 interface MatchWithAnalysis extends Match {
@@ -103,19 +102,16 @@ export default function Dashboard() {
         const matchesRes = await api.get<Match[]>("/api/v1/matches/");
         const basicMatches = matchesRes.data;
 
-        // Fetch Analysis Parallel
-        const analysisPromises = basicMatches.map((m) => 
-          api.get<AnalysisResponse>(`/api/v1/matches/${m.id}/analyze`)
-             .then(res => ({ id: m.id, data: res.data.ai_analysis }))
-             .catch(() => null)
-        );
+        // Fetch Analysis ของทั้ง Slate ใน Request เดียว (ตัด Quota ครั้งเดียว)
+        const predictions = await api
+          .get<PredictionsResponse>("/api/v1/matches/predictions")
+          .then(res => res.data.predictions)
+          .catch(() => ({} as Record<string, BackendPrediction>));
 
-        const analysisResults = await Promise.all(analysisPromises);
-
-        const mergedData = basicMatches.map((match) => {
-          const analysis = analysisResults.find(r => r?.id === match.id);
-          return { ...match, analysis: analysis?.data || undefined };
-        });
+        const mergedData = basicMatches.map((match) => ({
+          ...match,
+          analysis: predictions[String(match.id)] || undefined,
+        }));
 
         setMatches(mergedData);
       } catch (error) {